@@ -1,6 +1,16 @@
 from django.contrib import admin
 
-from .models import Comment, Follow, Group, Post
+from . import search
+from .forms import PostForm
+from .models import Comment, Follow, Group, Post, UserStats
+from .uploads import get_rejected_uploads
+
+
+class PostAdminForm(PostForm):
+    """PostForm со всеми полями модели: в админке задается и автор."""
+
+    class Meta(PostForm.Meta):
+        fields = '__all__'
 
 
 @admin.register(Post)
@@ -9,6 +19,23 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    form = PostAdminForm
+
+    def get_form(self, request, obj=None, **kwargs):
+        # Класс формы создается заново на каждый запрос, поэтому причины
+        # отказа в загрузке можно передать через его атрибут.
+        form = super().get_form(request, obj, **kwargs)
+        form.rejected_uploads = get_rejected_uploads(request)
+        return form
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search.is_available():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        if not search_term.strip():
+            return queryset, False
+        return search.filter_posts(queryset, search_term), False
 
 
 @admin.register(Group)
@@ -30,3 +57,12 @@ class FollowAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'author')
     search_fields = ('user', 'author')
     epty_value_display = '-пусто-'
+
+
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = (
+        'user', 'posts_count', 'followers_count', 'following_count'
+    )
+    search_fields = ('user__username',)
+    empty_value_display = '-пусто-'
@@ -0,0 +1,261 @@
+import json
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+
+from .models import Comment, Group, Post
+from .paginators import CommentPaginator, CursorPaginator, InvalidCursor
+from .storage import image_storage
+
+
+User = get_user_model()
+
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 500
+API_CHUNK_SIZE = 100
+
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'updated': 'updated',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comment_count': 'comment_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'created': 'created',
+    'author': 'author__username',
+    'text': 'text',
+}
+GROUP_FIELDS = {
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+}
+PROFILE_FIELDS = {
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'stats__posts_count',
+    'followers_count': 'stats__followers_count',
+    'following_count': 'stats__following_count',
+}
+
+
+def image_url(name):
+    return image_storage.url(name) if name else None
+
+
+CONVERTERS = {'image': image_url}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class RowCursorMixin:
+    """Курсор по строкам values_list, которые начинаются с (дата, id)."""
+
+    def cursor_key(self, row):
+        return row[0], row[1]
+
+
+class PostRowPaginator(RowCursorMixin, CursorPaginator):
+    pass
+
+
+class CommentRowPaginator(RowCursorMixin, CommentPaginator):
+    pass
+
+
+def api_view(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({'detail': str(error)}, status=error.status)
+    return require_safe(wrapper)
+
+
+def select_fields(request, fields):
+    """Имена полей из ?fields=a,b в порядке запроса, по умолчанию все."""
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(fields)
+    names = list(dict.fromkeys(
+        name.strip() for name in requested.split(',') if name.strip()
+    ))
+    unknown = [name for name in names if name not in fields]
+    if unknown or not names:
+        raise ApiError(f'Неизвестные поля: {", ".join(unknown)}')
+    return names
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', API_PAGE_SIZE))
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    if not 1 <= limit <= API_MAX_PAGE_SIZE:
+        raise ApiError(f'limit должен быть от 1 до {API_MAX_PAGE_SIZE}')
+    return limit
+
+
+def to_dict(names, values):
+    return {
+        name: CONVERTERS[name](value) if name in CONVERTERS else value
+        for name, value in zip(names, values)
+    }
+
+
+def dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def next_url(request, cursor):
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return request.build_absolute_uri(f'?{params.urlencode()}')
+
+
+def stream_page(request, paginator_class, queryset, fields):
+    """Страница строк после ?cursor= потоком JSON без создания моделей.
+
+    Из базы читается limit + 1 строка: последняя только сообщает, что
+    есть следующая страница.
+    """
+    names = select_fields(request, fields)
+    limit = get_limit(request)
+    paginator = paginator_class(queryset, limit)
+    try:
+        queryset, backwards = paginator.after(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise ApiError('Неверный курсор')
+    if backwards:
+        raise ApiError('Курсор ведет только вперед')
+    rows = queryset.values_list(
+        paginator.date_field, 'id', *(fields[name] for name in names)
+    )[:limit + 1].iterator(chunk_size=API_CHUNK_SIZE)
+
+    def generate():
+        yield '{"results": ['
+        chunk, separator, last, has_next = [], '', None, False
+        for index, row in enumerate(rows):
+            if index == limit:
+                has_next = True
+                break
+            chunk.append(dumps(to_dict(names, row[2:])))
+            last = row
+            if len(chunk) == API_CHUNK_SIZE:
+                yield separator + ', '.join(chunk)
+                chunk, separator = [], ', '
+        if chunk:
+            yield separator + ', '.join(chunk)
+        if has_next:
+            cursor = paginator.encode_cursor(last)
+            yield f'], "next": {dumps(next_url(request, cursor))}}}'
+        else:
+            yield '], "next": null}'
+
+    return StreamingHttpResponse(generate(), content_type='application/json')
+
+
+def get_object(queryset, fields, request, message):
+    names = select_fields(request, fields)
+    row = queryset.values_list(*(fields[name] for name in names)).first()
+    if row is None:
+        raise ApiError(message, status=404)
+    return JsonResponse(to_dict(names, row), json_dumps_params={
+        'ensure_ascii': False
+    })
+
+
+def get_pk(queryset, message):
+    pk = queryset.values_list('pk', flat=True).first()
+    if pk is None:
+        raise ApiError(message, status=404)
+    return pk
+
+
+@api_view
+def posts(request):
+    return stream_page(
+        request, PostRowPaginator, Post.objects.for_feed(), POST_FIELDS
+    )
+
+
+@api_view
+def post_detail(request, post_id):
+    return get_object(
+        Post.objects.filter(pk=post_id), POST_FIELDS, request,
+        'Запись не найдена'
+    )
+
+
+@api_view
+def post_comments(request, post_id):
+    pk = get_pk(Post.objects.filter(pk=post_id), 'Запись не найдена')
+    return stream_page(
+        request, CommentRowPaginator, Comment.objects.filter(post_id=pk),
+        COMMENT_FIELDS
+    )
+
+
+@api_view
+def groups(request):
+    names = select_fields(request, GROUP_FIELDS)
+    rows = Group.objects.order_by('slug').values_list(
+        *(GROUP_FIELDS[name] for name in names)
+    )
+    return JsonResponse(
+        {'results': [to_dict(names, row) for row in rows]},
+        json_dumps_params={'ensure_ascii': False}
+    )
+
+
+@api_view
+def group_posts(request, slug):
+    pk = get_pk(Group.objects.filter(slug=slug), 'Группа не найдена')
+    return stream_page(
+        request, PostRowPaginator, Post.objects.filter(group_id=pk),
+        POST_FIELDS
+    )
+
+
+@api_view
+def profile(request, username):
+    return get_object(
+        User.objects.filter(username=username), PROFILE_FIELDS, request,
+        'Пользователь не найден'
+    )
+
+
+@api_view
+def profile_posts(request, username):
+    pk = get_pk(
+        User.objects.filter(username=username), 'Пользователь не найден'
+    )
+    return stream_page(
+        request, PostRowPaginator, Post.objects.filter(author_id=pk),
+        POST_FIELDS
+    )
+
+
+@api_view
+def follow_index(request):
+    if not request.user.is_authenticated:
+        raise ApiError('Требуется авторизация', status=401)
+    return stream_page(
+        request, PostRowPaginator, Post.objects.for_follower(request.user),
+        POST_FIELDS
+    )
@@ -0,0 +1,284 @@
+import gc
+import json
+import os
+import random
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import mixer
+
+from .models import Comment, Follow, Group, Post, TimelineEntry, UserStats
+from .paginators import PAGE_SIZE
+from .transfer import explicit_dates
+
+
+User = get_user_model()
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json'
+)
+POSTS = 100000
+COMMENTS = 1000000
+USERS = 2000
+GROUPS = 50
+FOLLOWS_PER_USER = 20
+MIN_USERS = 20
+MIN_GROUPS = 2
+TEXT_POOL = 500
+FOLLOW_SKEW = 1.1
+COMMENT_SKEW = 0.8
+BATCH_SIZE = 5000
+REPEAT = 100
+LATENCY_THRESHOLD = 1.5
+MEMORY_THRESHOLD = 1.5
+# Метрики, которые сравниваются с базовыми значениями: количество
+# запросов не должно расти вовсе, время и память — больше порога.
+EXACT_METRICS = ('queries', 'queries_warm')
+LATENCY_METRICS = ('p99_ms', 'p99_warm_ms')
+MEMORY_METRICS = ('peak_kb',)
+
+
+def zipf_weights(count, skew):
+    return [1 / (rank + 1) ** skew for rank in range(count)]
+
+
+def bulk_create(model, objects):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            batch = []
+    model.objects.bulk_create(batch)
+
+
+def seed(scale=1.0, random_seed=0):
+    """Заполняет базу данными объемом POSTS * scale записей и т. д.
+
+    Подписки распределены по закону Ципфа: у первых авторов почти все
+    пользователи в подписчиках. Комментарии тоже сосредоточены на части
+    записей. Возвращает адреса и пользователей для замеров.
+    """
+    rng = random.Random(random_seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(random_seed)
+    users_count = max(int(USERS * scale), MIN_USERS)
+    posts_count = max(int(POSTS * scale), PAGE_SIZE * 3)
+    comments_count = int(COMMENTS * scale)
+    password = make_password(None)
+    bulk_create(User, (
+        User(
+            username=f'user{index}', password=password,
+            first_name=fake.first_name(), last_name=fake.last_name()
+        )
+        for index in range(users_count)
+    ))
+    user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+    groups = mixer.cycle(max(int(GROUPS * scale), MIN_GROUPS)).blend(Group)
+    texts = [
+        fake.text(max_nb_chars=rng.choice((100, 300, 1000)))
+        for _ in range(TEXT_POOL)
+    ]
+
+    post_numbers = range(posts_count)
+    commented = Counter(rng.choices(
+        post_numbers, weights=zipf_weights(posts_count, COMMENT_SKEW),
+        k=comments_count
+    ))
+    start = timezone.now() - timedelta(days=365)
+    step = timedelta(days=365) / posts_count
+    posts = [
+        Post(
+            id=number + 1, author_id=rng.choice(user_ids),
+            group=rng.choice(groups) if rng.random() < 0.5 else None,
+            text=rng.choice(texts), pub_date=start + step * number,
+            updated=start + step * number,
+            comment_count=commented[number]
+        )
+        for number in post_numbers
+    ]
+    date_fields = (
+        Post._meta.get_field('pub_date'), Post._meta.get_field('updated'),
+        Comment._meta.get_field('created'),
+    )
+    with explicit_dates(*date_fields):
+        bulk_create(Post, posts)
+        bulk_create(Comment, (
+            Comment(
+                post_id=posts[number].id, author_id=rng.choice(user_ids),
+                text=rng.choice(texts)[:200],
+                created=posts[number].pub_date
+                + timedelta(seconds=rng.randrange(7 * 24 * 3600))
+            )
+            for number, count in commented.items() for _ in range(count)
+        ))
+
+    follows = set()
+    weights = zipf_weights(len(user_ids), FOLLOW_SKEW)
+    for user_id in user_ids:
+        wanted = rng.randint(1, FOLLOWS_PER_USER * 2)
+        for author_id in rng.choices(user_ids, weights=weights, k=wanted):
+            if author_id != user_id:
+                follows.add((user_id, author_id))
+    bulk_create(Follow, (
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_id in sorted(follows)
+    ))
+    posts_by_author = defaultdict(list)
+    for post in posts:
+        posts_by_author[post.author_id].append(post)
+    bulk_create(TimelineEntry, (
+        TimelineEntry(
+            user_id=user_id, post_id=post.id, author_id=author_id,
+            pub_date=post.pub_date
+        )
+        for user_id, author_id in sorted(follows)
+        for post in posts_by_author[author_id]
+    ))
+    UserStats.objects.recount()
+    cache.clear()
+
+    top_post = max(posts, key=lambda post: post.comment_count)
+    top_group = Counter(post.group_id for post in posts if post.group_id)
+    following = Counter(user_id for user_id, _ in follows)
+    popular_author = User.objects.get(pk=user_ids[0])
+    reader = User.objects.get(pk=following.most_common(1)[0][0])
+    return {
+        'index': (reverse('posts:index'), None),
+        'index_deep': (
+            reverse('posts:index') + f'?page={posts_count // PAGE_SIZE // 2}',
+            None
+        ),
+        'group_posts': (reverse('posts:group', args=[
+            Group.objects.get(pk=top_group.most_common(1)[0][0]).slug
+        ]), None),
+        'profile': (
+            reverse('posts:profile', args=[popular_author.username]), None
+        ),
+        'post_view': (reverse('posts:post', args=[
+            top_post.author.username, top_post.id
+        ]), None),
+        'follow_index': (reverse('posts:follow_index'), reader),
+    }
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def timed_requests(client, url, repeat, cold):
+    """Время запросов в мс; сборщик мусора выключен, как в timeit."""
+    timings = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            if cold:
+                cache.clear()
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, (url, response.status_code)
+    finally:
+        gc.enable()
+    return timings
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as queries:
+        client.get(url)
+    return len(queries)
+
+
+def measure(url, user=None, repeat=REPEAT):
+    """Запросы, задержка и пик памяти одной страницы.
+
+    Холодные замеры идут с очищенным кэшем, теплые — с заполненным.
+    """
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    cache.clear()
+    # Журнал запросов очищается в начале каждого запроса, поэтому
+    # количество считывается сразу.
+    queries = count_queries(client, url)
+    queries_warm = count_queries(client, url)
+    cache.clear()
+    tracemalloc.start()
+    try:
+        client.get(url)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    cold = timed_requests(client, url, repeat, cold=True)
+    warm = timed_requests(client, url, repeat, cold=False)
+    return {
+        'queries': queries,
+        'queries_warm': queries_warm,
+        'p50_ms': round(percentile(cold, 0.5), 2),
+        'p99_ms': round(percentile(cold, 0.99), 2),
+        'p50_warm_ms': round(percentile(warm, 0.5), 2),
+        'p99_warm_ms': round(percentile(warm, 0.99), 2),
+        'peak_kb': round(peak / 1024),
+    }
+
+
+def run(targets, repeat=REPEAT):
+    return {
+        name: measure(url, user, repeat)
+        for name, (url, user) in targets.items()
+    }
+
+
+def load_baseline(path=BASELINE_PATH):
+    try:
+        with open(path, encoding='utf-8') as file_obj:
+            return json.load(file_obj)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(results, meta, path=BASELINE_PATH):
+    with open(path, 'w', encoding='utf-8') as file_obj:
+        json.dump(
+            {'meta': meta, 'views': results}, file_obj,
+            indent=2, sort_keys=True
+        )
+        file_obj.write('\n')
+
+
+def compare(results, baseline, latency_threshold=LATENCY_THRESHOLD,
+            memory_threshold=MEMORY_THRESHOLD, metrics=None):
+    """Список регрессий относительно базовых значений."""
+    regressions = []
+    for name, result in results.items():
+        expected = baseline['views'].get(name)
+        if expected is None:
+            continue
+        for metric in metrics or (
+            EXACT_METRICS + LATENCY_METRICS + MEMORY_METRICS
+        ):
+            if metric in EXACT_METRICS:
+                limit = expected[metric]
+            elif metric in LATENCY_METRICS:
+                limit = expected[metric] * latency_threshold
+            else:
+                limit = expected[metric] * memory_threshold
+            if result[metric] > limit:
+                regressions.append(
+                    f'{name}: {metric} {result[metric]} > {limit:g} '
+                    f'(база {expected[metric]})'
+                )
+    return regressions
@@ -0,0 +1,189 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template import Context
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from .models import Group
+
+
+User = get_user_model()
+
+POST_CARD_TEMPLATE = 'includes/post_item.html'
+
+
+def post_card_key(post_id, updated, is_author):
+    return 'post_card:{}:{}:{}'.format(
+        post_id, int(updated.timestamp() * 1000000), int(is_author)
+    )
+
+
+def post_card_keys(post_id, updated):
+    return [post_card_key(post_id, updated, is_author)
+            for is_author in (False, True)]
+
+
+def card_version(post):
+    """Версия группы и автора в том виде, в каком их показывает карточка.
+
+    Хранится вместе с карточкой: переименование группы или автора не
+    меняет updated записи, но делает карточку устаревшей.
+    """
+    group = post.group
+    return hashlib.md5('\n'.join((
+        post.author.username,
+        group.slug if group else '',
+        group.title if group else '',
+    )).encode()).hexdigest()
+
+
+def invalidate_post_cards(posts):
+    keys = []
+    for post_id, updated in posts:
+        keys.extend(post_card_keys(post_id, updated))
+    cache.delete_many(keys)
+
+
+def render_cards(posts, user):
+    """Рендерит карточки записей одним шаблоном в общем контексте."""
+    if not posts:
+        return []
+    template = get_template(POST_CARD_TEMPLATE).template
+    context = Context({'user': user})
+    cards = []
+    for post in posts:
+        with context.push(post=post):
+            cards.append(template.render(context))
+    return cards
+
+
+def render_post_cards(posts, user):
+    """Возвращает HTML карточек записей, используя кэш по каждой записи."""
+    keys = [
+        post_card_key(post.pk, post.updated, user.pk == post.author_id)
+        for post in posts
+    ]
+    versions = [card_version(post) for post in posts]
+    cached = cache.get_many(keys)
+    missing_keys, missing_posts = [], []
+    for key, version, post in zip(keys, versions, posts):
+        if cached.get(key, (None,))[0] != version:
+            missing_keys.append(key)
+            missing_posts.append(post)
+    missing = dict(zip(missing_keys, render_cards(missing_posts, user)))
+    cards = [
+        missing[key] if key in missing else cached[key][1] for key in keys
+    ]
+    if missing:
+        cache.set_many(
+            {
+                key: (version, missing[key])
+                for key, version in zip(keys, versions) if key in missing
+            },
+            getattr(settings, 'POSTS_CARD_CACHE_TIMEOUT', 86400)
+        )
+    return mark_safe(''.join(cards))
+
+
+PAGE_CACHE_GENERATION_KEY = 'page_cache_generation'
+PAGE_SCOPE_KEY = 'page_cache_scope:{}'
+INDEX_SCOPE = 'posts:index'
+
+
+def shared_cache():
+    """Общий для процессов уровень кэша, без локальной копии TieredCache."""
+    return getattr(cache, 'shared', cache)
+
+
+def page_cache_generation():
+    shared = shared_cache()
+    generation = shared.get(PAGE_CACHE_GENERATION_KEY)
+    if generation is None:
+        shared.add(PAGE_CACHE_GENERATION_KEY, 1, None)
+        generation = shared.get(PAGE_CACHE_GENERATION_KEY, 1)
+    return generation
+
+
+def purge_page_cache():
+    """Сбрасывает все страницы: для редких массовых изменений."""
+    try:
+        cache.incr(PAGE_CACHE_GENERATION_KEY)
+    except ValueError:
+        shared_cache().add(PAGE_CACHE_GENERATION_KEY, 1, None)
+
+
+def profile_scope(username):
+    return f'profile:{username}'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def page_scope(view_name, kwargs):
+    """Область страницы, которую сбрасывают вместе.
+
+    Страницы записей входят в область профиля автора: они показывают его
+    счетчики, которые меняются вместе с профилем.
+    """
+    if 'username' in kwargs:
+        return profile_scope(kwargs['username'])
+    if 'slug' in kwargs:
+        return group_scope(kwargs['slug'])
+    return view_name
+
+
+def new_scope_version():
+    # Версия по времени, а не с единицы: если ключ вытеснят из кэша, новая
+    # версия не совпадет с прежней и старые страницы не оживут.
+    return int(time.time() * 1000000)
+
+
+def page_scope_version(key):
+    shared = shared_cache()
+    version = shared.get(key)
+    if version is None:
+        shared.add(key, new_scope_version(), None)
+        version = shared.get(key, 0)
+    return version
+
+
+def purge_page_scopes(scopes):
+    """Сбрасывает страницы только указанных областей."""
+    for scope in set(scopes):
+        key = PAGE_SCOPE_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            shared_cache().add(key, new_scope_version(), None)
+
+
+def purge_pages(author_ids=(), group_ids=(), index=True):
+    """Сбрасывает главную и страницы, где видны эти авторы и группы."""
+    scopes = [INDEX_SCOPE] if index else []
+    author_ids = {pk for pk in author_ids if pk is not None}
+    group_ids = {pk for pk in group_ids if pk is not None}
+    if author_ids:
+        scopes.extend(map(profile_scope, User.objects.filter(
+            pk__in=author_ids
+        ).values_list('username', flat=True)))
+    if group_ids:
+        scopes.extend(map(group_scope, Group.objects.filter(
+            pk__in=group_ids
+        ).values_list('slug', flat=True)))
+    purge_page_scopes(scopes)
+
+
+def page_cache_key(request):
+    match = request.resolver_match
+    scope_key = PAGE_SCOPE_KEY.format(
+        page_scope(match.view_name, match.kwargs)
+    )
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return 'page_cache:{}:{}:{}'.format(
+        page_cache_generation(), page_scope_version(scope_key), path
+    )
@@ -1,7 +1,9 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
 from .models import Post, Comment
+from .uploads import check_dimensions, check_size, sanitize_image
 
 
 class PostForm(ModelForm):
@@ -15,6 +17,28 @@ class PostForm(ModelForm):
         model = Post
         fields = ['group', 'text', 'image']
 
+    # Причины отказа из get_rejected_uploads(request): файлов, отброшенных
+    # при загрузке, нет в request.FILES.
+    rejected_uploads = {}
+
+    def __init__(self, *args, rejected_uploads=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if rejected_uploads is not None:
+            self.rejected_uploads = rejected_uploads
+
+    def clean_image(self):
+        if 'image' in self.rejected_uploads:
+            raise forms.ValidationError(self.rejected_uploads['image'])
+        image = self.cleaned_data['image']
+        if not isinstance(image, UploadedFile):
+            return image
+        error = check_size(image.size) or check_dimensions(
+            *image.image.size
+        )
+        if error:
+            raise forms.ValidationError(error)
+        return sanitize_image(image)
+
 
 class CommentForm(ModelForm):
     text = forms.fields.CharField(
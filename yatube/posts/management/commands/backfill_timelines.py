@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import UserStats, fan_out_limit
+from posts.timelines import resume_fan_out
+
+
+class Command(BaseCommand):
+    help = (
+        'Раскладывает по лентам записи авторов, вернувшихся к лимиту '
+        'рассылки, если фоновый поток не успел это сделать'
+    )
+
+    def handle(self, *args, **options):
+        author_ids = UserStats.objects.filter(
+            followers_count__lte=fan_out_limit(),
+            celebrity_since__isnull=False
+        ).values_list('user_id', flat=True)
+        resumed = sum(
+            resume_fan_out(author_id) for author_id in list(author_ids)
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Заполнены ленты подписчиков авторов: {resumed}'
+        ))
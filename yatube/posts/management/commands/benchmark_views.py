@@ -0,0 +1,115 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from posts import benchmark
+
+
+LOCAL_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет временную базу данными и замеряет запросы, задержку и '
+        'память страниц записей; сравнивает результат с базовым. '
+        'Время и память зависят от машины: базу снимайте на той же'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', type=float, default=1.0,
+            help=(
+                f'Доля объема: 1 — {benchmark.POSTS} записей и '
+                f'{benchmark.COMMENTS} комментариев'
+            )
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=benchmark.REPEAT,
+            help='Запросов на страницу для каждого замера'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--baseline', default=benchmark.BASELINE_PATH,
+            help='Файл с базовыми значениями'
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Записать результат как новые базовые значения'
+        )
+        parser.add_argument(
+            '--latency-threshold', type=float,
+            default=benchmark.LATENCY_THRESHOLD,
+            help='Допустимый рост p99 относительно базы, раз'
+        )
+        parser.add_argument(
+            '--memory-threshold', type=float,
+            default=benchmark.MEMORY_THRESHOLD,
+            help='Допустимый рост пика памяти относительно базы, раз'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment(debug=False)
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            # Замеры очищают кэш, поэтому общий кэш сайта не используется.
+            with override_settings(CACHES=LOCAL_CACHES):
+                started = time.perf_counter()
+                targets = benchmark.seed(options['scale'], options['seed'])
+                self.stdout.write(
+                    f'Данные созданы за {time.perf_counter() - started:.1f} с'
+                )
+                results = benchmark.run(targets, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<14} запросов {result["queries"]:>3} '
+                f'({result["queries_warm"]} с кэшем)  '
+                f'p50 {result["p50_ms"]:>7.2f} мс  '
+                f'p99 {result["p99_ms"]:>7.2f} мс  '
+                f'с кэшем p50 {result["p50_warm_ms"]:>6.2f} мс  '
+                f'p99 {result["p99_warm_ms"]:>6.2f} мс  '
+                f'память {result["peak_kb"]:>6} КБ'
+            )
+        meta = {
+            'scale': options['scale'], 'repeat': options['repeat'],
+            'seed': options['seed'], 'profile': settings.SETTINGS_PROFILE,
+        }
+        if options['save_baseline']:
+            benchmark.save_baseline(results, meta, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовые значения записаны в {options["baseline"]}'
+            ))
+            return
+        baseline = benchmark.load_baseline(options['baseline'])
+        if baseline is None:
+            raise CommandError(
+                f'Нет базовых значений {options["baseline"]}, '
+                'запустите с --save-baseline'
+            )
+        if baseline['meta'] != meta:
+            self.stderr.write(
+                f'Базовые значения сняты с другими параметрами: '
+                f'{baseline["meta"]}'
+            )
+        regressions = benchmark.compare(
+            results, baseline,
+            options['latency_threshold'], options['memory_threshold']
+        )
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions:
+            raise CommandError(f'Регрессий: {len(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,108 @@
+import os
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.template import Engine, TemplateSyntaxError, engines
+
+from posts.cache import POST_CARD_TEMPLATE, render_cards
+from posts.models import Post
+from posts.paginators import PAGE_SIZE
+
+
+TEMPLATE_EXTENSIONS = ('.html', '.txt')
+UNCACHED_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def template_loaders(engine):
+    for loader in engine.template_loaders:
+        yield from getattr(loader, 'loaders', [loader])
+
+
+def template_names(engine):
+    """Перебирает имена всех шаблонов, которые видят загрузчики движка."""
+    names = set()
+    for loader in template_loaders(engine):
+        for directory in loader.get_dirs():
+            for root, _, files in os.walk(directory):
+                for file_name in files:
+                    if not file_name.endswith(TEMPLATE_EXTENSIONS):
+                        continue
+                    name = os.path.relpath(
+                        os.path.join(root, file_name), directory
+                    ).replace(os.sep, '/')
+                    if name not in names:
+                        names.add(name)
+                        yield name
+
+
+class Command(BaseCommand):
+    help = (
+        'Разбирает все шаблоны и кладет их в кэш загрузчика; '
+        'с --benchmark измеряет время рендера карточки записи'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--benchmark', type=int, default=0, metavar='N',
+            help='Отрендерить первую страницу ленты N раз и вывести время'
+        )
+
+    def compile(self, engine):
+        compiled, errors = 0, []
+        for name in template_names(engine):
+            try:
+                engine.get_template(name)
+            except (TemplateSyntaxError, UnicodeDecodeError) as error:
+                errors.append(f'{name}: {error}')
+            else:
+                compiled += 1
+        return compiled, errors
+
+    def benchmark(self, backend, repeat):
+        posts = list(Post.objects.for_feed()[:PAGE_SIZE])
+        if not posts:
+            raise CommandError('Нет записей для замера')
+        user = AnonymousUser()
+        uncached = Engine(
+            dirs=backend.engine.dirs, libraries=backend.engine.libraries,
+            loaders=UNCACHED_LOADERS
+        )
+        started = time.perf_counter()
+        for _ in range(repeat):
+            uncached.get_template(POST_CARD_TEMPLATE)
+        parse = (time.perf_counter() - started) / repeat
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for post in posts:
+                backend.get_template(POST_CARD_TEMPLATE).render(
+                    {'post': post, 'user': user}
+                )
+        separate = (time.perf_counter() - started) / repeat / len(posts)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            render_cards(posts, user)
+        shared = (time.perf_counter() - started) / repeat / len(posts)
+        self.stdout.write(
+            f'Разбор {POST_CARD_TEMPLATE}: {parse * 1e6:.0f} мкс\n'
+            f'Карточка, отдельный контекст: {separate * 1e6:.0f} мкс\n'
+            f'Карточка, общий контекст: {shared * 1e6:.0f} мкс'
+        )
+
+    def handle(self, *args, **options):
+        backend = engines['django']
+        started = time.perf_counter()
+        compiled, errors = self.compile(backend.engine)
+        elapsed = time.perf_counter() - started
+        for error in errors:
+            self.stderr.write(error)
+        if options['benchmark']:
+            self.benchmark(backend, options['benchmark'])
+        if errors:
+            raise CommandError(f'Ошибок в шаблонах: {len(errors)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Разобрано шаблонов: {compiled} за {elapsed:.2f} с'
+        ))
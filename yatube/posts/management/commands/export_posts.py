@@ -0,0 +1,53 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import (BATCH_SIZE, FIELDS, FORMATS, export_rows,
+                            guess_format, write_records)
+
+
+class Command(BaseCommand):
+    help = 'Выгружает записи, комментарии или подписки в JSON Lines или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл или - для стандартного вывода'
+        )
+        parser.add_argument(
+            '--kind', choices=list(FIELDS), default='posts',
+            help='Что выгружать'
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат файла, по умолчанию по расширению'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Строк, читаемых из базы за один раз'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or guess_format(path)
+        rows = export_rows(options['kind'], options['batch_size'])
+        started = time.perf_counter()
+        if path == '-':
+            count = write_records(
+                sys.stdout, file_format, options['kind'], rows
+            )
+            report = self.stderr
+        else:
+            try:
+                with open(path, 'w', encoding='utf-8', newline='') as file_obj:
+                    count = write_records(
+                        file_obj, file_format, options['kind'], rows
+                    )
+            except OSError as error:
+                raise CommandError(error)
+            report = self.stdout
+        elapsed = time.perf_counter() - started
+        report.write(self.style.SUCCESS(
+            f'Выгружено строк: {count} за {elapsed:.2f} с '
+            f'({count / max(elapsed, 1e-6):.0f} строк/с)'
+        ))
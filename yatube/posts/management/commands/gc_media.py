@@ -0,0 +1,103 @@
+import posixpath
+from datetime import timedelta
+from itertools import islice
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.models import Post
+from posts.thumbnails import (VARIANTS_DIR, load_manifest, release_image,
+                              remove_variants)
+
+
+BATCH_SIZE = 1000
+
+
+def batches(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = 'Удаляет изображения и варианты, на которые не ссылаются записи'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено'
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=60 * 60,
+            help='Не трогать файлы моложе указанного числа секунд'
+        )
+
+    def orphan_images(self, min_age):
+        field = Post._meta.get_field('image')
+        storage, directory = field.storage, field.upload_to.rstrip('/')
+        if not storage.exists(directory):
+            return
+        threshold = timezone.now() - timedelta(seconds=min_age)
+        for batch in batches(storage.walk(directory)):
+            referenced = set(Post.objects.filter(
+                image__in=batch
+            ).values_list('image', flat=True))
+            for name in batch:
+                if name in referenced:
+                    continue
+                if storage.get_modified_time(name) > threshold:
+                    continue
+                yield name
+
+    def variant_sets(self, directory=VARIANTS_DIR):
+        """Перебирает каталоги вариантов, в которых уже есть манифест."""
+        directories, files = default_storage.listdir(directory)
+        if 'manifest.json' in files:
+            yield directory
+            return
+        for name in directories:
+            yield from self.variant_sets(f'{directory}/{name}')
+
+    def orphan_variants(self):
+        if not default_storage.exists(VARIANTS_DIR):
+            return
+        for directory in self.variant_sets():
+            source = (load_manifest(directory) or {}).get('source')
+            if source and Post.objects.filter(image=source).exists():
+                continue
+            yield directory
+
+    def remove_empty_dirs(self, storage, directory, root):
+        """Удаляет опустевшие каталоги от directory вверх до root."""
+        while directory != root and storage.exists(directory):
+            if any(storage.listdir(directory)):
+                return
+            storage.delete(directory)
+            directory = posixpath.dirname(directory)
+
+    def handle(self, *args, **options):
+        images = list(self.orphan_images(options['min_age']))
+        variants = list(self.orphan_variants())
+        for name in images + variants:
+            self.stdout.write(name)
+        if not options['dry_run']:
+            storage = Post._meta.get_field('image').storage
+            root = Post._meta.get_field('image').upload_to.rstrip('/')
+            for name in images:
+                release_image(name, min_age=options['min_age'])
+                self.remove_empty_dirs(
+                    storage, posixpath.dirname(name), root
+                )
+            for directory in variants:
+                remove_variants(directory)
+                self.remove_empty_dirs(
+                    default_storage, directory, VARIANTS_DIR
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f'Изображений без записей: {len(images)}, '
+            f'каталогов вариантов: {len(variants)}'
+        ))
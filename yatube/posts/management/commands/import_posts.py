@@ -0,0 +1,65 @@
+import sys
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import (BATCH_SIZE, FIELDS, FORMATS, Importer,
+                            guess_format, read_records)
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает записи, комментарии или подписки из JSON Lines или CSV '
+        'пачками через bulk_create'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или - для стандартного ввода')
+        parser.add_argument(
+            '--kind', choices=list(FIELDS), default='posts',
+            help='Что загружать'
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат файла, по умолчанию по расширению'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Строк в одной транзакции'
+        )
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Создавать неизвестных пользователей без пароля'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        path = options['path']
+        file_format = options['format'] or guess_format(path)
+        importer = Importer(
+            options['kind'], options['batch_size'], options['create_users']
+        )
+        started = time.perf_counter()
+        try:
+            file_obj = (
+                nullcontext(sys.stdin) if path == '-'
+                else open(path, encoding='utf-8', newline='')
+            )
+        except OSError as error:
+            raise CommandError(error)
+        with file_obj as lines:
+            imported = importer.run(read_records(lines, file_format))
+        loaded = time.perf_counter() - started
+        importer.finish()
+        elapsed = time.perf_counter() - started
+        for number, error in importer.errors:
+            self.stderr.write(f'Строка {number}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено строк: {imported}, пропущено: '
+            f'{len(importer.errors)}, уже в базе: {importer.duplicates} '
+            f'за {elapsed:.2f} с '
+            f'({imported / max(loaded, 1e-6):.0f} строк/с, '
+            f'пересчет {elapsed - loaded:.2f} с)'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Заново строит полнотекстовый индекс записей'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('Полнотекстовый поиск работает только в SQLite')
+        with transaction.atomic():
+            count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано записей: {count}'
+        ))
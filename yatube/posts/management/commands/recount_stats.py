@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.cache import purge_page_cache
+from posts.models import Post, UserStats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики комментариев, записей и подписок'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            posts = Post.objects.recount_comments()
+            users = UserStats.objects.recount()
+        if posts:
+            purge_page_cache()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано записей: {posts}, пользователей: {users}'
+        ))
@@ -0,0 +1,35 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnail, run_in_worker
+
+
+class Command(BaseCommand):
+    help = 'Создает миниатюры для записей с изображениями'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать миниатюры и для записей, где они уже есть'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Количество параллельных потоков, 0 - без потоков'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            posts = posts.filter(thumbnail='')
+        post_ids = posts.values_list('pk', flat=True).iterator()
+        if not options['workers']:
+            urls = [generate_thumbnail(post_id) for post_id in post_ids]
+        else:
+            with ThreadPoolExecutor(options['workers']) as executor:
+                urls = list(executor.map(run_in_worker, post_ids))
+        created = sum(url is not None for url in urls)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано миниатюр: {created} из {len(urls)}'
+        ))
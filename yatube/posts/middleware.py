@@ -0,0 +1,119 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date, parse_http_date_safe
+
+from .cache import page_cache_key
+
+
+class AnonymousPageCacheMiddleware:
+    """Кэширует публичные страницы для анонимных читателей.
+
+    Запись кэша хранится дольше срока свежести: пока одна копия процесса
+    пересчитывает устаревшую страницу под блокировкой, остальные получают
+    предыдущую версию, а при полном промахе недолго ждут результат.
+    """
+    lock_timeout = 10
+    lock_wait = 0.5
+    poll_interval = 0.05
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        key = getattr(request, '_page_cache_key', None)
+        if key is None:
+            return response
+        try:
+            if self.can_store(response):
+                entry = self.store(key, response)
+                self.set_validators(response, entry)
+                return get_conditional_response(
+                    request, entry['etag'], entry['created'], response
+                )
+            return response
+        finally:
+            if request._page_cache_locked:
+                cache.delete(f'{key}:lock')
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.is_cacheable(request):
+            return None
+        key = page_cache_key(request)
+        entry = cache.get(key)
+        if entry is not None and entry['expires'] > time.time():
+            return self.cached_response(request, entry)
+        locked = cache.add(f'{key}:lock', 1, self.lock_timeout)
+        if not locked:
+            if entry is None:
+                entry = self.wait_for_entry(key)
+            if entry is not None:
+                return self.cached_response(request, entry)
+        request._page_cache_key = key
+        request._page_cache_locked = locked
+        return None
+
+    @staticmethod
+    def is_cacheable(request):
+        if getattr(settings, 'POSTS_PAGE_CACHE_TIMEOUT', 0) <= 0:
+            return False
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        if request.user.is_authenticated:
+            return False
+        views = getattr(settings, 'POSTS_PAGE_CACHE_VIEWS', ())
+        return request.resolver_match.view_name in views
+
+    @staticmethod
+    def can_store(response):
+        return (
+            response.status_code == 200 and not response.streaming
+            and not response.cookies
+        )
+
+    def wait_for_entry(self, key):
+        deadline = time.time() + self.lock_wait
+        while time.time() < deadline:
+            time.sleep(self.poll_interval)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry
+        return None
+
+    @staticmethod
+    def store(key, response):
+        timeout = settings.POSTS_PAGE_CACHE_TIMEOUT
+        grace = getattr(settings, 'POSTS_PAGE_CACHE_GRACE', timeout)
+        now = time.time()
+        last_modified = parse_http_date_safe(response.get('Last-Modified'))
+        entry = {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'etag': response.get('ETag') or quote_etag(
+                hashlib.md5(response.content).hexdigest()
+            ),
+            'created': last_modified or int(now),
+            'expires': now + timeout,
+        }
+        cache.set(key, entry, timeout + grace)
+        return entry
+
+    @staticmethod
+    def set_validators(response, entry):
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['created'])
+
+    def cached_response(self, request, entry):
+        response = HttpResponse(
+            entry['content'], content_type=entry['content_type']
+        )
+        self.set_validators(response, entry)
+        response['X-Page-Cache'] = 'HIT'
+        return get_conditional_response(
+            request, entry['etag'], entry['created'], response
+        )
@@ -0,0 +1,65 @@
+import re
+
+import snowballstemmer
+from django.db import migrations
+
+
+# Копия posts.search на момент миграции: код приложения может измениться,
+# а миграция должна строить индекс так же, как при ее создании.
+CREATE_TABLE_SQL = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts USING fts5('
+    "text, tokenize = 'unicode61 remove_diacritics 2')"
+)
+DROP_TABLE_SQL = 'DROP TABLE IF EXISTS posts_post_fts'
+INSERT_SQL = 'INSERT INTO posts_post_fts (rowid, text) VALUES (%s, %s)'
+BATCH_SIZE = 1000
+
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile('[а-яё]')
+
+
+def stem_text(text, stemmers):
+    words = WORD_RE.findall(text.lower())
+    return ' '.join(
+        stemmers['russian' if CYRILLIC_RE.search(word) else 'english']
+        .stemWord(word)
+        for word in words
+    )
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    stemmers = {
+        language: snowballstemmer.stemmer(language)
+        for language in ('russian', 'english')
+    }
+    schema_editor.execute(CREATE_TABLE_SQL)
+    rows = Post.objects.using(schema_editor.connection.alias).values_list(
+        'pk', 'text'
+    ).order_by('pk').iterator(chunk_size=BATCH_SIZE)
+    with schema_editor.connection.cursor() as cursor:
+        batch = []
+        for pk, text in rows:
+            batch.append((pk, stem_text(text, stemmers)))
+            if len(batch) == BATCH_SIZE:
+                cursor.executemany(INSERT_SQL, batch)
+                batch = []
+        cursor.executemany(INSERT_SQL, batch)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(DROP_TABLE_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
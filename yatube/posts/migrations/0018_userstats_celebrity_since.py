@@ -0,0 +1,38 @@
+# Generated by Django 2.2.6 on 2026-10-18 07:20
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+from django.utils import timezone
+
+
+def mark_celebrities(apps, schema_editor):
+    # Записи авторов, у которых уже сейчас больше подписчиков, чем лимит,
+    # могли не попасть в ленты с самой первой.
+    UserStats = apps.get_model('posts', 'UserStats')
+    Post = apps.get_model('posts', 'Post')
+    limit = getattr(settings, 'POSTS_FANOUT_FOLLOWER_LIMIT', 10000)
+    celebrities = UserStats.objects.filter(followers_count__gt=limit)
+    for user_id in celebrities.values_list('user_id', flat=True).iterator():
+        since = Post.objects.filter(author_id=user_id).aggregate(
+            since=Min('pub_date')
+        )['since']
+        UserStats.objects.filter(user_id=user_id).update(
+            celebrity_since=since or timezone.now()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='celebrity_since',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Записи не рассылаются по лентам с'),
+        ),
+        migrations.RunPython(mark_celebrities, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,14 @@
+import json
+from itertools import islice
+
+from django.conf import settings
 from django.db import models
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.contrib.auth import get_user_model
 
+from .storage import image_storage
 
 User = get_user_model()
 
@@ -19,9 +27,72 @@ class Group(models.Model):
         return self.title[:30]
 
 
+def count_subquery(queryset, field):
+    return Coalesce(models.Subquery(
+        queryset.filter(**{field: models.OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(count=models.Count('pk')).values('count')
+    ), 0)
+
+
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        return self.select_related('author', 'group')
+
+    def for_follower(self, user, authors=None):
+        """Лента подписок user.
+
+        authors — строки (id автора, число его подписчиков, celebrity_since)
+        из followed_authors(), если они уже прочитаны. Записи авторов сверх
+        лимита и тех, чьи ленты еще не дозаполнены, читаются напрямую.
+        """
+        if authors is None:
+            authors = followed_authors(user)
+        celebrities = [
+            author_id for author_id, followers_count, since in authors
+            if (followers_count or 0) > fan_out_limit() or since is not None
+        ]
+        if celebrities:
+            return self.filter(
+                models.Q(pk__in=user.timeline.values('post'))
+                | models.Q(author__in=celebrities)
+            )
+        return self.filter(timeline_entries__user=user).order_by(
+            '-timeline_entries__pub_date'
+        )
+
+    def with_following(self, user):
+        """Добавляет is_following: подписан ли user на автора записи."""
+        if not user.is_authenticated:
+            return self.annotate(is_following=models.Value(
+                False, output_field=models.BooleanField()
+            ))
+        return self.annotate(is_following=models.Exists(
+            Follow.objects.filter(user=user, author=models.OuterRef('author'))
+        ))
+
+    def change_comment_count(self, delta):
+        return self.update(
+            comment_count=Greatest(models.F('comment_count') + delta, 0),
+            updated=timezone.now()
+        )
+
+    def recount_comments(self):
+        """Исправляет разошедшиеся comment_count.
+
+        У исправленных записей обновляется updated, иначе их карточки и ETag
+        так и показывали бы прежнее число комментариев.
+        """
+        actual = count_subquery(Comment.objects.all(), 'post')
+        return self.exclude(comment_count=actual).update(
+            comment_count=actual, updated=timezone.now()
+        )
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField('date published', auto_now_add=True)
+    updated = models.DateTimeField('date updated', auto_now=True)
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='posts'
     )
@@ -31,13 +102,63 @@ class Post(models.Model):
         verbose_name='Группа'
     )
     image = models.ImageField(
-        upload_to='posts/', blank=True, null=True, verbose_name='Изображение')
+        upload_to='posts/', storage=image_storage, blank=True, null=True,
+        db_index=True, verbose_name='Изображение'
+    )
+    thumbnail = models.CharField(
+        max_length=255, blank=True, editable=False, verbose_name='Миниатюра'
+    )
+    image_variants = models.TextField(
+        blank=True, editable=False, verbose_name='Варианты изображения'
+    )
+    comment_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Количество комментариев'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
 
+    @cached_property
+    def variants(self):
+        try:
+            variants = json.loads(self.image_variants or '{}')
+        except ValueError:
+            return {}
+        return variants if isinstance(variants, dict) else {}
+
+    @property
+    def image_sources(self):
+        return [
+            {'type': f'image/{name}', 'srcset': self.get_srcset(name)}
+            for name in ('avif', 'webp') if name in self.variants
+        ]
+
+    @property
+    def image_srcset(self):
+        return self.get_srcset('jpeg')
+
+    def get_srcset(self, name):
+        return ', '.join(
+            f'{variant["url"]} {variant["width"]}w'
+            for variant in self.variants.get(name, ())
+        )
+
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['group', '-pub_date'], name='post_group_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_id_idx'
+            ),
+        ]
 
 
 class Comment(models.Model):
@@ -54,6 +175,13 @@ class Comment(models.Model):
     def __str__(self):
         return self.text[:15]
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created_idx'
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -73,5 +201,185 @@ class Follow(models.Model):
             models.CheckConstraint(
                 check=~models.Q(user=models.F('author')),
                 name='user_is_not_author'
+            ),
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'
+            ),
+        ]
+
+
+def fan_out_limit():
+    return getattr(settings, 'POSTS_FANOUT_FOLLOWER_LIMIT', 10000)
+
+
+def followed_authors(user):
+    return list(Follow.objects.filter(user=user).values_list(
+        'author_id', 'author__stats__followers_count',
+        'author__stats__celebrity_since'
+    ))
+
+
+class TimelineEntryQuerySet(models.QuerySet):
+    batch_size = 1000
+
+    def insert(self, entries):
+        """Вставляет записи ленты пачками по batch_size.
+
+        bulk_create собирает объекты в список, поэтому генератор режется
+        заранее. Размер одного INSERT выбирает бэкенд: явный batch_size
+        в Django 2.2 обходит ограничение SQLite в 500 строк.
+        """
+        entries = iter(entries)
+        batch = list(islice(entries, self.batch_size))
+        while batch:
+            self.bulk_create(batch, ignore_conflicts=True)
+            batch = list(islice(entries, self.batch_size))
+
+    def fan_out(self, post):
+        is_celebrity = UserStats.objects.filter(
+            user_id=post.author_id, followers_count__gt=fan_out_limit()
+        ).exists()
+        if is_celebrity:
+            return
+        follower_ids = Follow.objects.filter(
+            author_id=post.author_id
+        ).values_list('user_id', flat=True)
+        self.insert(
+            TimelineEntry(
+                user_id=user_id, post_id=post.pk,
+                author_id=post.author_id, pub_date=post.pub_date
+            ) for user_id in follower_ids.iterator()
+        )
+
+    def backfill(self, user_id, author_id):
+        posts = Post.objects.filter(author_id=author_id).values_list(
+            'pk', 'pub_date'
+        )
+        self.insert(
+            TimelineEntry(
+                user_id=user_id, post_id=post_id,
+                author_id=author_id, pub_date=pub_date
+            ) for post_id, pub_date in posts.iterator()
+        )
+
+    def backfill_followers(self, author_id, since):
+        """Раскладывает по лентам подписчиков записи автора с даты since.
+
+        Записи, опубликованные, пока подписчиков было больше
+        fan_out_limit(), в ленты не попадали.
+        """
+        posts = list(Post.objects.filter(
+            author_id=author_id, pub_date__gte=since
+        ).values_list('pk', 'pub_date'))
+        if not posts:
+            return
+        follower_ids = Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True)
+        self.insert(
+            TimelineEntry(
+                user_id=user_id, post_id=post_id,
+                author_id=author_id, pub_date=pub_date
             )
+            for user_id in follower_ids.iterator()
+            for post_id, pub_date in posts
+        )
+
+    def trim(self, user_id, author_id):
+        return self.filter(user_id=user_id, author_id=author_id).delete()
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name='timeline', verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE,
+        related_name='timeline_entries', verbose_name='Запись'
+    )
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name='+', verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField('date published')
+
+    objects = TimelineEntryQuerySet.as_manager()
+
+    def __str__(self):
+        return f'Лента {self.user_id}: {self.post_id}'
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date'], name='timeline_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'], name='timeline_user_author_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry'
+            ),
         ]
+
+
+class UserStatsQuerySet(models.QuerySet):
+    def change(self, user_id, field, delta):
+        return self.filter(user_id=user_id).update(
+            **{field: Greatest(models.F(field) + delta, 0)}
+        )
+
+    def for_user(self, user):
+        """Статистика пользователя; если строки нет, она пересчитывается.
+
+        Строку создает сигнал post_save, которого нет у пользователей из
+        loaddata, bulk_create и import_posts.
+        """
+        try:
+            return user.stats
+        except UserStats.DoesNotExist:
+            self.recount(User.objects.filter(pk=user.pk))
+            user.stats = self.get(user_id=user.pk)
+            return user.stats
+
+    def recount(self, users=None):
+        if users is None:
+            users = User.objects.all()
+        self.bulk_create(
+            [UserStats(user_id=pk) for pk in users.values_list(
+                'pk', flat=True
+            )],
+            ignore_conflicts=True
+        )
+        return self.filter(user__in=users).update(
+            posts_count=count_subquery(Post.objects.all(), 'author'),
+            followers_count=count_subquery(Follow.objects.all(), 'author'),
+            following_count=count_subquery(Follow.objects.all(), 'user'),
+        )
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True,
+        related_name='stats', verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0, verbose_name='Количество записей'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0, verbose_name='Подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0, verbose_name='Подписок'
+    )
+    celebrity_since = models.DateTimeField(
+        null=True, blank=True,
+        verbose_name='Записи не рассылаются по лентам с'
+    )
+
+    objects = UserStatsQuerySet.as_manager()
+
+    def __str__(self):
+        return f'Статистика {self.user}'
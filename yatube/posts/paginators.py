@@ -0,0 +1,272 @@
+import base64
+import binascii
+import hashlib
+import time
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .cache import shared_cache
+
+
+PAGE_SIZE = 10
+COMMENTS_PAGE_SIZE = 20
+PAGE_WINDOW_ON_EACH_SIDE = 2
+PAGE_WINDOW_ON_ENDS = 1
+OFFSET = 'offset'
+CURSOR = 'cursor'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def count_cache_key(*parts):
+    return 'posts_count:' + ':'.join(str(part) for part in parts)
+
+
+def author_version_key(author_id):
+    return count_cache_key('author_version', author_id)
+
+
+def bump_author_version(author_id):
+    """Меняет версию автора, от которой зависят счетчики лент подписок."""
+    shared = shared_cache()
+    try:
+        shared.incr(author_version_key(author_id))
+    except ValueError:
+        # Версия из времени не совпадет ни с одной из прежних.
+        shared.set(author_version_key(author_id), time.time_ns(), None)
+
+
+def follow_count_key(user, author_ids):
+    """Ключ счетчика ленты подписок с версиями всех ее авторов.
+
+    Новая запись меняет версию только своего автора, поэтому обходить
+    всех его подписчиков не нужно.
+    """
+    keys = [author_version_key(pk) for pk in sorted(author_ids)]
+    shared = shared_cache()
+    versions = shared.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        shared.set_many(missing, None)
+        versions.update(missing)
+    digest = hashlib.md5(
+        ','.join(f'{key}={versions[key]}' for key in keys).encode()
+    ).hexdigest()
+    return count_cache_key('follow', user.pk, digest)
+
+
+def cached_count(object_list, key):
+    if key is None:
+        return object_list.count()
+    count = cache.get(key)
+    if count is None:
+        count = object_list.count()
+        cache.set(
+            key, count, getattr(settings, 'POSTS_COUNT_CACHE_TIMEOUT', 3600)
+        )
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, хранящий общее количество записей в кэше.
+
+    Ключи сбрасываются сигналами при сохранении и удалении записей.
+    В режиме approximate количество оценивается по максимальному
+    первичному ключу таблицы без обхода строк.
+    """
+
+    def __init__(self, object_list, per_page, count_key=None,
+                 approximate=False, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+        self.approximate = approximate
+
+    @cached_property
+    def count(self):
+        if self.approximate:
+            manager = self.object_list.model._default_manager
+            return manager.aggregate(count=Max('pk'))['count'] or 0
+        return cached_count(self.object_list, self.count_key)
+
+
+class CursorPaginator:
+    """Постраничный вывод по ключу (дата, id) без OFFSET и COUNT(*).
+
+    По умолчанию записи идут от новых к старым по (pub_date, id).
+    """
+    is_cursor = True
+    date_field = 'pub_date'
+    ascending = False
+
+    def __init__(self, object_list, per_page, count_key=None):
+        self.object_list = object_list.order_by(*self.ordering(False))
+        self.per_page = int(per_page)
+        self.count_key = count_key
+
+    @cached_property
+    def count(self):
+        return cached_count(self.object_list, self.count_key)
+
+    def ordering(self, backwards):
+        prefix = '' if self.ascending != backwards else '-'
+        return f'{prefix}{self.date_field}', f'{prefix}id'
+
+    def cursor_key(self, item):
+        return getattr(item, self.date_field), item.pk
+
+    def encode_cursor(self, item, backwards=False):
+        date, pk = self.cursor_key(item)
+        value = '{}{}|{}'.format(
+            '-' if backwards else '+', date.isoformat(), pk
+        )
+        return base64.urlsafe_b64encode(value.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            value = base64.urlsafe_b64decode(cursor.encode()).decode()
+            date, pk = value[1:].split('|')
+            date, pk = parse_datetime(date), int(pk)
+        except (binascii.Error, UnicodeError, ValueError):
+            raise InvalidCursor(cursor)
+        if value[0] not in '+-' or date is None:
+            raise InvalidCursor(cursor)
+        return value[0] == '-', date, pk
+
+    def after(self, cursor=None):
+        """QuerySet записей после курсора и направление обхода."""
+        if not cursor:
+            return self.object_list, False
+        backwards, date, pk = self.decode_cursor(cursor)
+        lookup = 'gt' if self.ascending != backwards else 'lt'
+        queryset = self.object_list.filter(
+            Q(**{f'{self.date_field}__{lookup}': date})
+            | Q(**{self.date_field: date, f'id__{lookup}': pk})
+        ).order_by(*self.ordering(backwards))
+        return queryset, backwards
+
+    def page(self, cursor=None):
+        queryset, backwards = self.after(cursor)
+        return self._page(queryset, cursor or None, backwards)
+
+    def get_page(self, cursor):
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+    def _page(self, queryset, cursor, backwards):
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if backwards:
+            items.reverse()
+            return CursorPage(items, self, cursor, has_more, True)
+        return CursorPage(items, self, cursor, cursor is not None, has_more)
+
+
+class CommentPaginator(CursorPaginator):
+    """Комментарии от старых к новым по ключу (created, id)."""
+    date_field = 'created'
+    ascending = True
+
+    def first_page(self, total):
+        """Первая страница без лишней строки: о следующей судит total.
+
+        Возвращает загруженный QuerySet и страницу с теми же объектами.
+        """
+        queryset = self.object_list[:self.per_page]
+        items = list(queryset)
+        return queryset, CursorPage(
+            items, self, None, False, total > len(items)
+        )
+
+
+class CursorPage(Sequence):
+    number = None
+
+    def __init__(self, object_list, paginator, cursor, has_previous, has_next):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __repr__(self):
+        return '<Cursor page {}>'.format(self.cursor or 'first')
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if self.has_next():
+            return self.paginator.encode_cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous():
+            return self.paginator.encode_cursor(
+                self.object_list[0], backwards=True
+            )
+
+
+def page_window(paginator, number, on_each_side=PAGE_WINDOW_ON_EACH_SIDE,
+                on_ends=PAGE_WINDOW_ON_ENDS):
+    """Номера страниц по краям и вокруг текущей, None — пропуск.
+
+    Размер результата не зависит от числа страниц.
+    """
+    num_pages = paginator.num_pages
+    if num_pages <= (on_each_side + on_ends) * 2 + 1:
+        return list(range(1, num_pages + 1))
+    pages = []
+    if number > on_each_side + on_ends + 2:
+        pages.extend(range(1, on_ends + 1))
+        pages.append(None)
+        start = number - on_each_side
+    else:
+        start = 1
+    if number < num_pages - on_each_side - on_ends - 1:
+        pages.extend(range(start, number + on_each_side + 1))
+        pages.append(None)
+        pages.extend(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        pages.extend(range(start, num_pages + 1))
+    return pages
+
+
+def get_pagination_mode(view_name):
+    modes = getattr(settings, 'POSTS_PAGINATION', {})
+    return modes.get(view_name, OFFSET)
+
+
+def paginate(request, object_list, view_name, count_key=None,
+             approximate=False):
+    if get_pagination_mode(view_name) == CURSOR:
+        paginator = CursorPaginator(object_list, PAGE_SIZE, count_key)
+        return paginator.get_page(request.GET.get('cursor'))
+    paginator = CachedCountPaginator(
+        object_list, PAGE_SIZE, count_key, approximate
+    )
+    return paginator.get_page(request.GET.get('page'))
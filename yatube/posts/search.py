@@ -0,0 +1,164 @@
+import re
+
+import snowballstemmer
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+
+TABLE = 'posts_post_fts'
+CREATE_TABLE_SQL = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5('
+    "text, tokenize = 'unicode61 remove_diacritics 2')"
+)
+DROP_TABLE_SQL = f'DROP TABLE IF EXISTS {TABLE}'
+INSERT_SQL = f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)'
+DELETE_SQL = f'DELETE FROM {TABLE} WHERE rowid = %s'
+MATCH_SQL = f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s'
+COUNT_SQL = f'SELECT count(*) FROM {TABLE} WHERE {TABLE} MATCH %s'
+RANKED_SQL = f'{MATCH_SQL} ORDER BY rank LIMIT %s OFFSET %s'
+MAX_QUERY_TERMS = 10
+REBUILD_BATCH_SIZE = 1000
+
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile('[а-яё]')
+STEMMERS = {
+    'russian': snowballstemmer.stemmer('russian'),
+    'english': snowballstemmer.stemmer('english'),
+}
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def stem(word):
+    language = 'russian' if CYRILLIC_RE.search(word) else 'english'
+    return STEMMERS[language].stemWord(word)
+
+
+def stem_text(text):
+    """Текст в виде основ слов через пробел — так он хранится в индексе."""
+    return ' '.join(stem(word) for word in WORD_RE.findall(text.lower()))
+
+
+def match_expression(query):
+    """Запрос FTS5: все слова запроса, приведенные к основам."""
+    terms = dict.fromkeys(stem_text(query).split())
+    return ' '.join(f'"{term}"' for term in list(terms)[:MAX_QUERY_TERMS])
+
+
+def index_post(post):
+    with connection.cursor() as cursor:
+        cursor.execute(DELETE_SQL, [post.pk])
+        cursor.execute(INSERT_SQL, [post.pk, stem_text(post.text)])
+
+
+def remove_post(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(DELETE_SQL, [post_id])
+
+
+def fill(cursor, rows):
+    """Пишет пары (id, текст) в индекс пачками, возвращает их число."""
+    count = 0
+    batch = []
+    for pk, text in rows:
+        batch.append((pk, stem_text(text)))
+        if len(batch) == REBUILD_BATCH_SIZE:
+            cursor.executemany(INSERT_SQL, batch)
+            count += len(batch)
+            batch = []
+    cursor.executemany(INSERT_SQL, batch)
+    return count + len(batch)
+
+
+def index_posts(queryset):
+    """Переиндексирует записи QuerySet и возвращает их количество."""
+    rows = queryset.values_list('pk', 'text').order_by('pk').iterator(
+        chunk_size=REBUILD_BATCH_SIZE
+    )
+    count = 0
+    batch = []
+    with connection.cursor() as cursor:
+        for row in rows:
+            batch.append(row)
+            if len(batch) == REBUILD_BATCH_SIZE:
+                cursor.executemany(DELETE_SQL, [(pk,) for pk, _ in batch])
+                count += fill(cursor, batch)
+                batch = []
+        cursor.executemany(DELETE_SQL, [(pk,) for pk, _ in batch])
+        return count + fill(cursor, batch)
+
+
+def rebuild():
+    """Заполняет индекс заново и возвращает количество записей."""
+    rows = Post.objects.values_list('pk', 'text').order_by('pk').iterator(
+        chunk_size=REBUILD_BATCH_SIZE
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_TABLE_SQL)
+        cursor.execute(f'DELETE FROM {TABLE}')
+        count = fill(cursor, rows)
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return count
+
+
+class SearchResults:
+    """Найденные записи в порядке релевантности (bm25).
+
+    Поддерживает count() и срезы, поэтому передается в Paginator как есть:
+    страница — один запрос к индексу с LIMIT/OFFSET и один к posts_post.
+    """
+
+    def __init__(self, match, queryset):
+        self.match = match
+        self.queryset = queryset
+
+    def count(self):
+        with connection.cursor() as cursor:
+            cursor.execute(COUNT_SQL, [self.match])
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        if index.stop is None or index.stop <= start:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                RANKED_SQL, [self.match, index.stop - start, start]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = self.queryset.in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search_posts(query, queryset=None):
+    """Записи, содержащие все слова запроса, от более релевантных.
+
+    Без FTS5 (не SQLite) ищет вхождение строки запроса в текст.
+    """
+    if queryset is None:
+        queryset = Post.objects.for_feed()
+    if not is_available():
+        if not query.strip():
+            return queryset.none()
+        return queryset.filter(text__icontains=query.strip())
+    match = match_expression(query)
+    if not match:
+        return queryset.none()
+    return SearchResults(match, queryset)
+
+
+def filter_posts(queryset, query):
+    """Фильтр QuerySet по индексу с сохранением его сортировки."""
+    match = match_expression(query)
+    if not match:
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(MATCH_SQL, [match]))
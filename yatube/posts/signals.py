@@ -0,0 +1,237 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import search
+from .cache import invalidate_post_cards, purge_page_cache, purge_pages
+from .models import (
+    Comment, Follow, Group, Post, TimelineEntry, UserStats, fan_out_limit
+)
+from .paginators import bump_author_version, count_cache_key
+from .thumbnails import release_image
+from .timelines import pause_fan_out, schedule_resume
+
+
+User = get_user_model()
+
+# Записи, которые сейчас удаляются вместе с комментариями: счетчик
+# комментариев у них обновлять не нужно.
+_deleting = threading.local()
+
+
+def deleting_post_ids():
+    if not hasattr(_deleting, 'post_ids'):
+        _deleting.post_ids = set()
+    return _deleting.post_ids
+
+
+def post_count_keys(post):
+    keys = [
+        count_cache_key('index'),
+        count_cache_key('author', post.author_id),
+    ]
+    if post.group_id is not None:
+        keys.append(count_cache_key('group', post.group_id))
+    return keys
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_state(sender, instance, raw, **kwargs):
+    if instance.pk is None or raw:
+        return
+    previous = Post.objects.filter(pk=instance.pk).values_list(
+        'author_id', 'group_id', 'updated', 'image'
+    ).first()
+    if previous is not None:
+        (instance._previous_author_id, instance._previous_group_id,
+         updated, instance._previous_image) = previous
+        invalidate_post_cards([(instance.pk, updated)])
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post_counts(sender, instance, created, **kwargs):
+    if created:
+        cache.delete_many(post_count_keys(instance))
+        bump_author_version(instance.author_id)
+        return
+    keys = []
+    previous_author_id = getattr(instance, '_previous_author_id', None)
+    if previous_author_id not in (None, instance.author_id):
+        keys.append(count_cache_key('author', previous_author_id))
+        keys.append(count_cache_key('author', instance.author_id))
+        bump_author_version(previous_author_id)
+        bump_author_version(instance.author_id)
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id != instance.group_id:
+        keys.extend(
+            count_cache_key('group', group_id)
+            for group_id in (previous_group_id, instance.group_id)
+            if group_id is not None
+        )
+    cache.delete_many(keys)
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post_counts(sender, instance, **kwargs):
+    cache.delete_many(post_count_keys(instance))
+    bump_author_version(instance.author_id)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def increment_posts_count(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        UserStats.objects.change(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def decrement_posts_count(sender, instance, **kwargs):
+    UserStats.objects.change(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        post = Post.objects.filter(pk=instance.post_id)
+        invalidate_post_cards(post.values_list('pk', 'updated'))
+        post.change_comment_count(1)
+
+
+@receiver(pre_delete, sender=Post)
+def remember_deleting_post(sender, instance, **kwargs):
+    deleting_post_ids().add(instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, **kwargs):
+    if instance.post_id in deleting_post_ids():
+        return
+    post = Post.objects.filter(pk=instance.post_id)
+    invalidate_post_cards(post.values_list('pk', 'updated'))
+    post.change_comment_count(-1)
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post_cards(sender, instance, **kwargs):
+    deleting_post_ids().discard(instance.pk)
+    invalidate_post_cards([(instance.pk, instance.updated)])
+
+
+@receiver(post_save, sender=Follow)
+def increment_follow_counts(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        UserStats.objects.change(instance.user_id, 'following_count', 1)
+        UserStats.objects.change(instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def decrement_follow_counts(sender, instance, **kwargs):
+    UserStats.objects.change(instance.user_id, 'following_count', -1)
+    UserStats.objects.change(instance.author_id, 'followers_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        TimelineEntry.objects.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        TimelineEntry.objects.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    TimelineEntry.objects.trim(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def pause_celebrity_fan_out(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        pause_fan_out(instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def resume_former_celebrity(sender, instance, **kwargs):
+    # Автор вернулся к лимиту: пропущенные записи раскладываются по лентам
+    # в фоне, а до тех пор лента подписок читает их напрямую.
+    if UserStats.objects.filter(
+        user_id=instance.author_id, followers_count__lte=fan_out_limit(),
+        celebrity_since__isnull=False
+    ).exists():
+        schedule_resume(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, **kwargs):
+    previous_image = getattr(instance, '_previous_image', None)
+    if previous_image and previous_image != instance.image.name:
+        transaction.on_commit(lambda: release_image(previous_image))
+    if instance.image and instance.image.name != previous_image:
+        name, storage = instance.image.name, instance.image.storage
+        transaction.on_commit(lambda: storage.confirm(name))
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: release_image(name))
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, **kwargs):
+    if search.is_available():
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def remove_deleted_post(sender, instance, **kwargs):
+    if search.is_available():
+        search.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def purge_group_pages(sender, **kwargs):
+    # Название группы есть на карточках всех страниц.
+    purge_page_cache()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def purge_post_pages(sender, instance, **kwargs):
+    purge_pages(
+        (instance.author_id, getattr(instance, '_previous_author_id', None)),
+        (instance.group_id, getattr(instance, '_previous_group_id', None))
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def purge_comment_pages(sender, instance, **kwargs):
+    if instance.post_id in deleting_post_ids():
+        return
+    post = Post.objects.filter(pk=instance.post_id).values_list(
+        'author_id', 'group_id'
+    ).first()
+    if post is not None:
+        purge_pages(post[:1], post[1:])
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def purge_follow_pages(sender, instance, **kwargs):
+    purge_pages((instance.author_id, instance.user_id), index=False)
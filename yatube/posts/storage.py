@@ -0,0 +1,96 @@
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+FILE_LOCK_TIMEOUT = 60
+FILE_LOCK_WAIT = 0.1
+# Сколько живет отметка о загрузке, запись для которой еще не сохранена.
+# Если запись так и не появится, файл удалит gc_media.
+PENDING_TIMEOUT = 60 * 60
+
+
+@contextmanager
+def cache_lock(key, timeout, wait):
+    """Блокировка через cache.add, общая для всех процессов с общим кэшем."""
+    deadline = time.monotonic() + timeout
+    while not cache.add(key, 1, timeout):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f'Блокировка {key} занята')
+        time.sleep(wait)
+    try:
+        yield
+    finally:
+        cache.delete(key)
+
+
+def name_digest(name):
+    return hashlib.md5(name.encode()).hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла — SHA-256 его содержимого.
+
+    Файлы раскладываются по каталогам <upload_to>/ab/cd/<hash>.<ext>,
+    поэтому одинаковые загрузки занимают место на диске один раз.
+    """
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            directory, digest[:2], digest[2:4], f'{digest}{extension}'
+        )
+
+    def lock(self, name):
+        """Блокировка файла на время сохранения или удаления."""
+        return cache_lock(
+            'image-lock:' + name_digest(name), FILE_LOCK_TIMEOUT,
+            FILE_LOCK_WAIT
+        )
+
+    def is_pending(self, name):
+        """Файл только что сохранен, и запись с ним еще не зафиксирована."""
+        return cache.get('image-pending:' + name_digest(name)) is not None
+
+    def confirm(self, name):
+        """Снимает отметку о загрузке после фиксации записи с файлом."""
+        cache.delete('image-pending:' + name_digest(name))
+
+    def _save(self, name, content):
+        # Уже существующий файл может в это же время удалять release_image:
+        # отметка под общей блокировкой не дает удалить его, пока запись
+        # с новой ссылкой не зафиксирована.
+        name = self.content_name(name, content)
+        with self.lock(name):
+            cache.set('image-pending:' + name_digest(name), 1, PENDING_TIMEOUT)
+            if self.exists(name):
+                # Свежее время изменения защищает файл и от gc_media.
+                os.utime(self.path(name))
+                return name
+            return super()._save(name, content)
+
+    def walk(self, directory=''):
+        """Перебирает имена всех файлов в каталоге и его подкаталогах."""
+        directories, files = self.listdir(directory)
+        for file_name in files:
+            yield os.path.join(directory, file_name)
+        for name in directories:
+            yield from self.walk(os.path.join(directory, name))
+
+
+image_storage = ContentAddressedStorage()
@@ -0,0 +1,17 @@
+from django import template
+from django.contrib.auth.models import AnonymousUser
+
+from ..cache import render_post_cards
+
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    return render_post_cards(list(posts), context.get('user', AnonymousUser()))
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    return post_cards(context, [post])
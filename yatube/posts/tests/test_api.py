@@ -0,0 +1,119 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='user')
+        cls.author = User.objects.create(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Запись {i}', author=cls.author,
+                group=cls.group if i % 2 else None
+            )
+            for i in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.user, text='Комментарий'
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ApiTest.user)
+
+    def get_json(self, client, url, **params):
+        response = client.get(url, params)
+        if response.streaming:
+            return json.loads(b''.join(response.streaming_content))
+        return json.loads(response.content)
+
+    def test_feed_pages_by_cursor(self):
+        """Лента отдается страницами по курсору от новых к старым"""
+        url = reverse('api:posts')
+        data = self.get_json(self.guest_client, url, limit=3)
+        self.assertEqual(
+            [post['id'] for post in data['results']],
+            [post.id for post in ApiTest.posts[:1:-1]]
+        )
+        data = self.get_json(self.guest_client, data['next'])
+        self.assertEqual(
+            [post['id'] for post in data['results']],
+            [post.id for post in ApiTest.posts[1::-1]]
+        )
+        self.assertIsNone(data['next'])
+
+    def test_field_selection(self):
+        """Параметр fields ограничивает набор полей"""
+        data = self.get_json(
+            self.guest_client, reverse('api:posts'), fields='text,author'
+        )
+        self.assertEqual(
+            data['results'][0], {'text': 'Запись 4', 'author': 'author'}
+        )
+        response = self.guest_client.get(
+            reverse('api:posts'), {'fields': 'password'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_feed_is_one_query(self):
+        """Страница ленты загружается одним запросом"""
+        with self.assertNumQueries(1):
+            self.get_json(self.guest_client, reverse('api:posts'))
+
+    def test_resources(self):
+        """Группы, профиль, записи группы и комментарии"""
+        group = self.get_json(self.guest_client, reverse('api:groups'))
+        self.assertEqual(group['results'][0]['slug'], 'group')
+        group_posts = self.get_json(
+            self.guest_client, reverse('api:group_posts', args=['group'])
+        )
+        self.assertEqual(len(group_posts['results']), 2)
+        profile = self.get_json(
+            self.guest_client, reverse('api:profile', args=['author'])
+        )
+        self.assertEqual(profile['posts_count'], 5)
+        comments = self.get_json(
+            self.guest_client,
+            reverse('api:post_comments', args=[ApiTest.posts[0].id])
+        )
+        self.assertEqual(comments['results'][0]['text'], 'Комментарий')
+        post = self.get_json(
+            self.guest_client, reverse('api:post', args=[ApiTest.posts[0].id])
+        )
+        self.assertEqual(post['image'], None)
+
+    def test_errors(self):
+        """Несуществующие объекты и неверные параметры"""
+        for url, params, status in (
+            (reverse('api:post', args=[0]), {}, 404),
+            (reverse('api:profile_posts', args=['nobody']), {}, 404),
+            (reverse('api:posts'), {'cursor': 'bad'}, 400),
+            (reverse('api:posts'), {'limit': 0}, 400),
+            (reverse('api:follow_index'), {}, 401),
+        ):
+            with self.subTest(url=url, params=params):
+                response = self.guest_client.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', json.loads(response.content))
+
+    def test_follow_feed(self):
+        """Лента подписок доступна авторизованному пользователю"""
+        Follow.objects.create(user=ApiTest.user, author=ApiTest.author)
+        data = self.get_json(
+            self.authorized_client, reverse('api:follow_index')
+        )
+        self.assertEqual(len(data['results']), 5)
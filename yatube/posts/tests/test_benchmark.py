@@ -0,0 +1,35 @@
+from django.test import TestCase
+
+from .. import benchmark
+
+
+class BenchmarkTest(TestCase):
+    def test_query_counts_match_baseline(self):
+        """Количество запросов страниц не выросло относительно базы"""
+        baseline = benchmark.load_baseline()
+        self.assertIsNotNone(baseline)
+        targets = benchmark.seed(scale=0.001)
+        results = benchmark.run(targets, repeat=1)
+        self.assertEqual(set(results), set(baseline['views']))
+        self.assertEqual(
+            benchmark.compare(
+                results, baseline, metrics=benchmark.EXACT_METRICS
+            ),
+            []
+        )
+
+    def test_compare_reports_regressions(self):
+        """Рост запросов и превышение порогов считаются регрессией"""
+        baseline = {'views': {'index': {
+            'queries': 2, 'queries_warm': 0, 'p99_ms': 10,
+            'p99_warm_ms': 1, 'peak_kb': 100,
+        }}}
+        result = {'index': {
+            'queries': 3, 'queries_warm': 0, 'p99_ms': 14,
+            'p99_warm_ms': 2, 'peak_kb': 200,
+        }}
+        regressions = benchmark.compare(result, baseline)
+        self.assertEqual(
+            [regression.split(' ')[1] for regression in regressions],
+            ['queries', 'p99_warm_ms', 'peak_kb']
+        )
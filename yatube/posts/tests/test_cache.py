@@ -1,10 +1,15 @@
+from io import StringIO
+
 from django.core.cache import cache
-from django.core.cache.utils import make_template_fragment_key
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.template.loader import get_template
 from django.test import Client, TestCase
 from django.urls import reverse
 
-from ..models import Post
+from ..cache import (POST_CARD_TEMPLATE, card_version, post_card_key,
+                     render_cards)
+from ..models import Comment, Group, Post
 
 
 User = get_user_model()
@@ -22,10 +27,92 @@ class CacheTest(TestCase):
 
     def setUp(self):
         self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(CacheTest.user)
+        cache.clear()
+
+    def get_card(self, is_author=False):
+        post = Post.objects.get(pk=CacheTest.post.pk)
+        entry = cache.get(post_card_key(post.pk, post.updated, is_author))
+        return entry and entry[1]
 
     def test_index_page_cache(self):
-        """Главная страница кэшируется"""
+        """Карточки записей главной страницы кэшируются"""
+        self.guest_client.get(reverse('posts:index'))
+        self.assertIn(CacheTest.post.text, self.get_card())
+        self.assertIsNone(self.get_card(is_author=True))
+
+    def test_card_depends_on_viewer(self):
+        """Автор и гость получают разные карточки"""
+        self.guest_client.get(reverse('posts:index'))
+        self.authorized_client.get(reverse('posts:index'))
+        self.assertNotIn('Редактировать', self.get_card())
+        self.assertIn('Редактировать', self.get_card(is_author=True))
+
+    def test_cards_are_reused_across_feeds(self):
+        """Карточка, отрисованная в одной ленте, используется в других"""
         self.guest_client.get(reverse('posts:index'))
-        key = make_template_fragment_key('index_page', [1])
-        value = cache.get(key)
-        self.assertIsNotNone(value)
+        post = Post.objects.get(pk=CacheTest.post.pk)
+        cache.set(
+            post_card_key(post.pk, post.updated, False),
+            (card_version(post), self.get_card().replace(post.text, 'Из кэша'))
+        )
+        response = self.guest_client.get(reverse(
+            'posts:profile', kwargs={'username': CacheTest.user.username}
+        ))
+        self.assertContains(response, 'Из кэша')
+
+    def test_edit_and_comment_update_card_immediately(self):
+        """Изменение записи и комментарии сразу видны в ленте"""
+        self.guest_client.get(reverse('posts:index'))
+        post = Post.objects.get(pk=CacheTest.post.pk)
+        old_key = post_card_key(post.pk, post.updated, False)
+        post.text = 'Измененный текст'
+        post.save()
+        self.assertIsNone(cache.get(old_key))
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Измененный текст')
+        Comment.objects.create(post=post, author=CacheTest.user, text='Ок')
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_group_and_author_rename_update_card(self):
+        """Новое название группы и имя автора сразу видны в карточке"""
+        group = Group.objects.create(title='Старая группа', slug='old')
+        Post.objects.filter(pk=CacheTest.post.pk).update(group=group)
+        self.guest_client.get(reverse('posts:index'))
+        group.title = 'Новая группа'
+        group.save()
+        author = User.objects.get(pk=CacheTest.user.pk)
+        author.username = 'renamed'
+        author.save()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, '#Новая группа')
+        self.assertContains(response, '@renamed')
+
+
+class CompileTemplatesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='user')
+        cls.posts = [
+            Post.objects.create(text=f'Запись {number}', author=cls.user)
+            for number in range(3)
+        ]
+
+    def test_shared_context_matches_separate_render(self):
+        """Карточки в общем контексте совпадают с отдельным рендером"""
+        template = get_template(POST_CARD_TEMPLATE)
+        user = CompileTemplatesTest.user
+        self.assertEqual(render_cards(CompileTemplatesTest.posts, user), [
+            template.render({'post': post, 'user': user})
+            for post in CompileTemplatesTest.posts
+        ])
+
+    def test_compile_templates_command(self):
+        """Команда compile_templates разбирает шаблоны и замеряет рендер"""
+        out = StringIO()
+        call_command('compile_templates', benchmark=2, stdout=out)
+        self.assertIn('Карточка, общий контекст', out.getvalue())
+        self.assertIn('Разобрано шаблонов', out.getvalue())
@@ -0,0 +1,147 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, UserStats
+
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(CountersTest.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(CountersTest.reader)
+
+    def get_stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_stats_created_for_new_user(self):
+        """Для нового пользователя создается строка статистики"""
+        stats = self.get_stats(CountersTest.author)
+        self.assertEqual(stats.posts_count, 0)
+        self.assertEqual(stats.followers_count, 0)
+        self.assertEqual(stats.following_count, 0)
+
+    def test_posts_count(self):
+        """Создание и удаление записи меняют счетчик записей автора"""
+        self.author_client.post(
+            reverse('posts:new_post'), data={'text': 'Новая запись'}
+        )
+        self.assertEqual(self.get_stats(CountersTest.author).posts_count, 1)
+        Post.objects.get(text='Новая запись').delete()
+        self.assertEqual(self.get_stats(CountersTest.author).posts_count, 0)
+
+    def test_comment_count(self):
+        """Комментарии меняют счетчик комментариев записи"""
+        post = Post.objects.create(
+            text='Текст тестовой записи', author=CountersTest.author
+        )
+        self.reader_client.post(
+            reverse('posts:add_comment', kwargs={
+                'username': CountersTest.author.username, 'post_id': post.id
+            }),
+            data={'text': 'Комментарий'}
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        Comment.objects.filter(post=post).delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+
+    def test_post_delete_skips_comment_counter(self):
+        """Удаление записи не обновляет счетчик для каждого комментария"""
+        post = Post.objects.create(
+            text='Текст тестовой записи', author=CountersTest.author
+        )
+        Comment.objects.bulk_create(
+            Comment(post=post, author=CountersTest.reader, text='Текст')
+            for _ in range(10)
+        )
+        post = Post.objects.get(pk=post.pk)
+        with CaptureQueriesContext(connection) as queries:
+            post.delete()
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'comment_count' in query['sql']
+        ])
+
+    def test_profile_of_user_without_stats(self):
+        """Профиль пользователя без строки статистики открывается"""
+        User.objects.bulk_create([User(username='imported')])
+        user = User.objects.get(username='imported')
+        Post.objects.create(text='Запись', author=user)
+        response = self.reader_client.get(
+            reverse('posts:profile', kwargs={'username': user.username})
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Количество записей: 1')
+
+    def test_follow_counts(self):
+        """Подписка и отписка меняют счетчики подписок"""
+        kwargs = {'username': CountersTest.author.username}
+        for _ in range(2):
+            self.reader_client.get(
+                reverse('posts:profile_follow', kwargs=kwargs)
+            )
+        self.assertEqual(
+            self.get_stats(CountersTest.author).followers_count, 1
+        )
+        self.assertEqual(
+            self.get_stats(CountersTest.reader).following_count, 1
+        )
+        response = self.reader_client.get(
+            reverse('posts:profile', kwargs=kwargs)
+        )
+        self.assertContains(response, 'Подписчиков: 1')
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', kwargs=kwargs)
+        )
+        self.assertEqual(
+            self.get_stats(CountersTest.author).followers_count, 0
+        )
+        self.assertEqual(
+            self.get_stats(CountersTest.reader).following_count, 0
+        )
+
+    def test_recount_stats_repairs_drift(self):
+        """Команда recount_stats исправляет расхождения счетчиков"""
+        post = Post.objects.create(
+            text='Текст тестовой записи', author=CountersTest.author
+        )
+        Comment.objects.create(
+            post=post, author=CountersTest.reader, text='Комментарий'
+        )
+        Follow.objects.create(
+            user=CountersTest.reader, author=CountersTest.author
+        )
+        Post.objects.update(comment_count=7)
+        updated = Post.objects.get(pk=post.pk).updated
+        UserStats.objects.update(
+            posts_count=5, followers_count=5, following_count=5
+        )
+        UserStats.objects.filter(user=CountersTest.reader).delete()
+        call_command('recount_stats', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertGreater(post.updated, updated)
+        author_stats = self.get_stats(CountersTest.author)
+        reader_stats = self.get_stats(CountersTest.reader)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(author_stats.following_count, 0)
+        self.assertEqual(reader_stats.following_count, 1)
@@ -1,17 +1,21 @@
 from collections import namedtuple
+from io import BytesIO
 import shutil
 import tempfile
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from ..models import Comment, Group, Post
 
 
 User = get_user_model()
+CONTENT_NAME = r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.png$'
 
 
 @override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
@@ -80,7 +84,7 @@ class PostCreateFormTest(TestCase):
             Post.objects.filter(
                 author=self.user,
                 text=form_fields['text'],
-                image=f'posts/{image.name}'
+                image__regex=CONTENT_NAME
             ).exists()
         )
 
@@ -107,7 +111,7 @@ class PostCreateFormTest(TestCase):
             PostCreateFormTest.group.posts.filter(
                 author=PostCreateFormTest.user,
                 text=form_fields['text'],
-                image=f'posts/{image.name}'
+                image__regex=CONTENT_NAME
             ).exists()
         )
 
@@ -159,7 +163,7 @@ class PostCreateFormTest(TestCase):
             Post.objects.filter(
                 author=PostCreateFormTest.user,
                 text=form_fields['text'],
-                image=f'posts/{image.name}'
+                image__regex=CONTENT_NAME
             ).exists()
         )
 
@@ -177,6 +181,112 @@ class PostCreateFormTest(TestCase):
         self.assertEqual(Post.objects.count(), posts_count)
 
 
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR),
+    POSTS_THUMBNAIL_WORKERS=0
+)
+class PostImageUploadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='test_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(PostImageUploadTest.user)
+
+    @staticmethod
+    def get_image(name='image.jpg', size=(100, 50), **options):
+        file_obj = BytesIO()
+        Image.new('RGB', size=size, color=(255, 0, 0)).save(
+            file_obj, 'jpeg', **options
+        )
+        return SimpleUploadedFile(
+            name, file_obj.getvalue(), content_type='image/jpeg'
+        )
+
+    def create_post(self, image):
+        return self.authorized_client.post(
+            reverse('posts:new_post'), data={'text': 'Текст', 'image': image}
+        )
+
+    @override_settings(POSTS_UPLOAD_MAX_BYTES=512)
+    def test_large_file_is_rejected(self):
+        """Файл больше POSTS_UPLOAD_MAX_BYTES отклоняется"""
+        response = self.create_post(self.get_image(size=(400, 400)))
+        self.assertFalse(Post.objects.exists())
+        self.assertFormError(
+            response, 'form', 'image',
+            'Файл слишком большой, максимальный размер — 512\xa0байт'
+        )
+
+    @override_settings(POSTS_UPLOAD_MAX_PIXELS=100 * 100)
+    def test_large_dimensions_are_rejected_by_header(self):
+        """Изображение с большим разрешением отклоняется по заголовку"""
+        with mock.patch('PIL.ImageFile.ImageFile.load') as load:
+            response = self.create_post(self.get_image(size=(200, 100)))
+        load.assert_not_called()
+        self.assertFalse(Post.objects.exists())
+        self.assertFormError(
+            response, 'form', 'image',
+            'Изображение слишком большое: 200×100 пикселей'
+        )
+
+    def test_admin_creates_post_with_image(self):
+        """Запись с изображением создается через админку"""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.authorized_client.force_login(admin)
+        response = self.authorized_client.post(
+            reverse('admin:posts_post_add'), data={
+                'text': 'Текст', 'author': admin.pk,
+                'image': self.get_image(), 'comment_count': 0,
+            }
+        )
+        self.assertRedirects(response, reverse('admin:posts_post_changelist'))
+        post = Post.objects.get()
+        self.assertEqual(post.author, admin)
+        self.assertTrue(post.image)
+
+    @override_settings(POSTS_UPLOAD_MAX_BYTES=512)
+    def test_large_file_is_rejected_in_admin(self):
+        """Админка показывает ошибку для слишком большого файла"""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.authorized_client.force_login(admin)
+        response = self.authorized_client.post(
+            reverse('admin:posts_post_add'), data={
+                'text': 'Текст', 'author': admin.pk,
+                'image': self.get_image(size=(400, 400)),
+            }
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Post.objects.exists())
+        self.assertFormError(
+            response, 'adminform', 'image',
+            'Файл слишком большой, максимальный размер — 512\xa0байт'
+        )
+
+    def test_exif_is_stripped(self):
+        """Метаданные EXIF удаляются, ориентация применяется к изображению"""
+        exif = Image.Exif()
+        exif[0x0110] = 'Camera'
+        exif[0x0112] = 6
+        self.create_post(self.get_image(exif=exif.tobytes()))
+        post = Post.objects.get()
+        with post.image.open('rb') as image_file:
+            image = Image.open(image_file)
+            self.assertEqual(image.size, (50, 100))
+            self.assertFalse(image.getexif())
+
+
 class CommentCreateFormTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -0,0 +1,122 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..cache import page_cache_key
+from ..models import Comment, Follow, Post
+
+
+User = get_user_model()
+
+
+@override_settings(POSTS_PAGE_CACHE_TIMEOUT=60, POSTS_PAGE_CACHE_GRACE=60)
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='user')
+        cls.post = Post.objects.create(
+            text='Текст тестовой записи', author=cls.user
+        )
+        cls.url = reverse('posts:index')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(AnonymousPageCacheTest.user)
+
+    def test_anonymous_pages_are_cached(self):
+        """Повторный запрос гостя отдается из кэша"""
+        first = self.guest_client.get(self.url)
+        self.assertNotIn('X-Page-Cache', first)
+        second = self.guest_client.get(self.url)
+        self.assertEqual(second['X-Page-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertIn('Last-Modified', second)
+
+    def test_authorized_pages_are_not_cached(self):
+        """Страницы авторизованных пользователей не кэшируются"""
+        self.guest_client.get(self.url)
+        response = self.authorized_client.get(self.url)
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertContains(response, 'Редактировать')
+
+    def test_conditional_request_returns_not_modified(self):
+        """Запрос с актуальным ETag получает ответ 304"""
+        etag = self.guest_client.get(self.url)['ETag']
+        response = self.guest_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_changes_purge_cached_pages(self):
+        """Новые записи и комментарии сбрасывают кэш страниц"""
+        self.guest_client.get(self.url)
+        post = Post.objects.create(
+            text='Новая запись', author=AnonymousPageCacheTest.user
+        )
+        response = self.guest_client.get(self.url)
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertContains(response, 'Новая запись')
+        Comment.objects.create(
+            post=post, author=AnonymousPageCacheTest.user, text='Ок'
+        )
+        response = self.guest_client.get(self.url)
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_changes_purge_only_affected_pages(self):
+        """Изменения сбрасывают только страницы, на которых они видны"""
+        author = AnonymousPageCacheTest.user
+        other = User.objects.create(username='other')
+        other_url = reverse('posts:profile', kwargs={'username': 'other'})
+        post_url = reverse('posts:post', kwargs={
+            'username': author.username,
+            'post_id': AnonymousPageCacheTest.post.id
+        })
+        for url in (self.url, other_url, post_url):
+            self.guest_client.get(url)
+        Post.objects.create(text='Новая запись', author=author)
+        self.assertEqual(
+            self.guest_client.get(other_url)['X-Page-Cache'], 'HIT'
+        )
+        for url in (self.url, post_url):
+            self.assertNotIn('X-Page-Cache', self.guest_client.get(url))
+        Follow.objects.create(user=author, author=other)
+        self.assertNotIn('X-Page-Cache', self.guest_client.get(other_url))
+        self.assertEqual(
+            self.guest_client.get(self.url)['X-Page-Cache'], 'HIT'
+        )
+
+    def test_stale_page_is_served_while_recomputed(self):
+        """Пока страница пересчитывается, гости получают прежнюю версию"""
+        self.guest_client.get(self.url)
+        request = self.guest_client.get(self.url).wsgi_request
+        key = page_cache_key(request)
+        entry = cache.get(key)
+        cache.set(key, dict(entry, expires=0))
+        cache.add(f'{key}:lock', 1)
+        response = self.guest_client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        cache.delete(f'{key}:lock')
+        response = self.guest_client.get(self.url)
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertGreater(cache.get(key)['expires'], 0)
+
+    def test_missing_page_waits_for_concurrent_render(self):
+        """При промахе запрос ждет страницу, которую строит другой запрос"""
+        request = self.guest_client.get(self.url).wsgi_request
+        key = page_cache_key(request)
+        entry = cache.get(key)
+        cache.delete(key)
+        cache.add(f'{key}:lock', 1)
+        with mock.patch(
+            'posts.middleware.AnonymousPageCacheMiddleware.wait_for_entry',
+            return_value=entry
+        ) as wait_for_entry:
+            response = self.guest_client.get(self.url)
+        wait_for_entry.assert_called_once_with(key)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
@@ -1,7 +1,10 @@
+from unittest import skipUnless
+
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
 from django.test import TestCase
 
-from ..models import Post, Group
+from ..models import Comment, Follow, Group, Post
 
 
 class PostModelTest(TestCase):
@@ -45,3 +48,46 @@ class GroupModelTest(TestCase):
             str(group),
             msg='Проверьте правильность вывода Group.__str__'
         )
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Планы запросов SQLite')
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        User = get_user_model()
+        cls.user = User.objects.create(username='test_user')
+        cls.author = User.objects.create(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Описание тестовой группы'
+        )
+        cls.post = Post.objects.create(
+            text='Текст тестовой записи', author=cls.author, group=cls.group
+        )
+
+    def test_feed_queries_use_composite_indexes(self):
+        """Запросы лент используют составные индексы"""
+        user, post = QueryPlanTest.user, QueryPlanTest.post
+        querysets = {
+            'post_group_pub_date_idx': QueryPlanTest.group.posts.all(),
+            'post_author_pub_date_idx': user.posts.all(),
+            'post_pub_date_id_idx': Post.objects.order_by('-pub_date', '-id'),
+            'comment_post_created_idx': Comment.objects.filter(
+                post=post
+            ).order_by('created'),
+        }
+        for index, queryset in querysets.items():
+            with self.subTest(index=index):
+                self.assertIn(index, queryset.explain())
+
+    def test_follow_is_unique(self):
+        """Нельзя подписаться на автора дважды"""
+        Follow.objects.create(
+            user=QueryPlanTest.user, author=QueryPlanTest.author
+        )
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(
+                user=QueryPlanTest.user, author=QueryPlanTest.author
+            )
@@ -0,0 +1,210 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Group, Post
+from ..paginators import (
+    CachedCountPaginator, CursorPage, CursorPaginator, count_cache_key,
+    follow_count_key, page_window
+)
+
+
+User = get_user_model()
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='user')
+        Post.objects.bulk_create([Post(
+            text=f'Текст тестовой записи {i}',
+            author=cls.user
+        ) for i in range(13)])
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        )
+
+    def setUp(self):
+        self.paginator = CursorPaginator(Post.objects.all(), 10)
+
+    def test_first_page(self):
+        """Первая страница содержит самые новые записи"""
+        page = self.paginator.get_page(None)
+        self.assertEqual([post.id for post in page], self.expected[:10])
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+
+    def test_next_and_previous_cursors(self):
+        """Курсоры позволяют переходить вперед и назад без пропусков"""
+        first = self.paginator.get_page(None)
+        second = self.paginator.get_page(first.next_cursor)
+        self.assertEqual([post.id for post in second], self.expected[10:])
+        self.assertFalse(second.has_next())
+        self.assertTrue(second.has_previous())
+        back = self.paginator.get_page(second.previous_cursor)
+        self.assertEqual([post.id for post in back], self.expected[:10])
+        self.assertFalse(back.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Некорректный курсор возвращает первую страницу"""
+        for cursor in ('garbage', 'Kw==', '!!!'):
+            with self.subTest(cursor=cursor):
+                page = self.paginator.get_page(cursor)
+                self.assertEqual(
+                    [post.id for post in page], self.expected[:10]
+                )
+
+    @override_settings(POSTS_PAGINATION={'index': 'cursor'})
+    def test_index_uses_cursor_pagination(self):
+        """Главная страница использует курсорную пагинацию по настройке"""
+        cache.clear()
+        client = Client()
+        response = client.get(reverse('posts:index'))
+        page = response.context['page']
+        self.assertIsInstance(page, CursorPage)
+        self.assertContains(response, f'?cursor={page.next_cursor}')
+        response = client.get(
+            reverse('posts:index'), {'cursor': page.next_cursor}
+        )
+        self.assertEqual(len(response.context['page']), 3)
+
+
+class CachedCountPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='user')
+        cls.follower = User.objects.create(username='follower')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Описание тестовой группы'
+        )
+        Follow.objects.create(user=cls.follower, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_post(self, group=None):
+        return Post.objects.create(
+            text='Текст тестовой записи',
+            author=CachedCountPaginatorTest.user,
+            group=group
+        )
+
+    def get_count(self, queryset, key):
+        return CachedCountPaginator(queryset, 10, key).count
+
+    def test_count_is_cached(self):
+        """Количество записей берется из кэша"""
+        self.create_post()
+        key = count_cache_key('index')
+        self.assertEqual(self.get_count(Post.objects.all(), key), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_count(Post.objects.all(), key), 1)
+
+    def test_count_is_invalidated(self):
+        """Создание, изменение и удаление записи сбрасывают счетчики"""
+        user, group = CachedCountPaginatorTest.user, self.group
+        querysets = {
+            count_cache_key('index'): Post.objects.all(),
+            count_cache_key('author', user.pk): user.posts.all(),
+            count_cache_key('group', group.pk): group.posts.all(),
+        }
+        follow_queryset = Post.objects.filter(
+            author__following__user=CachedCountPaginatorTest.follower
+        )
+
+        def get_follow_count():
+            return self.get_count(follow_queryset, follow_count_key(
+                CachedCountPaginatorTest.follower, [user.pk]
+            ))
+
+        post = self.create_post(group)
+        for key, queryset in querysets.items():
+            self.assertEqual(self.get_count(queryset, key), 1)
+        self.assertEqual(get_follow_count(), 1)
+        post.group = None
+        post.save()
+        self.assertEqual(
+            self.get_count(group.posts.all(), count_cache_key(
+                'group', group.pk
+            )), 0
+        )
+        post.delete()
+        for key, queryset in querysets.items():
+            with self.subTest(key=key):
+                self.assertEqual(self.get_count(queryset, key), 0)
+        self.assertEqual(get_follow_count(), 0)
+
+    def test_text_edit_keeps_counts(self):
+        """Изменение текста записи не сбрасывает счетчики"""
+        post = self.create_post(self.group)
+        keys = [
+            count_cache_key('index'),
+            count_cache_key('group', self.group.pk),
+        ]
+        for key in keys:
+            self.get_count(Post.objects.all(), key)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(len(cache.get_many(keys)), len(keys))
+
+    def test_approximate_count(self):
+        """Приблизительное количество не требует подсчета строк"""
+        post = self.create_post()
+        paginator = CachedCountPaginator(
+            Post.objects.all(), 10, approximate=True
+        )
+        self.assertEqual(paginator.count, post.pk)
+
+
+class PageWindowTest(SimpleTestCase):
+    def test_small_paginator_shows_all_pages(self):
+        """При небольшом числе страниц показываются все"""
+        paginator = Paginator(range(70), 10)
+        self.assertEqual(page_window(paginator, 4), [1, 2, 3, 4, 5, 6, 7])
+
+    def test_window_around_current_page(self):
+        """Показываются края и соседи текущей страницы"""
+        paginator = Paginator(range(100000), 10)
+        self.assertEqual(page_window(paginator, 1), [1, 2, 3, None, 10000])
+        self.assertEqual(
+            page_window(paginator, 5000),
+            [1, None, 4998, 4999, 5000, 5001, 5002, None, 10000]
+        )
+        self.assertEqual(
+            page_window(paginator, 9999),
+            [1, None, 9997, 9998, 9999, 10000]
+        )
+        self.assertEqual(
+            page_window(paginator, 4), [1, 2, 3, 4, 5, 6, None, 10000]
+        )
+
+
+class PaginatorTemplateTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='user')
+        Post.objects.bulk_create([
+            Post(text=f'Запись {i}', author=cls.user) for i in range(200)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_paginator_renders_window(self):
+        """Шаблон выводит только окно ссылок на страницы"""
+        response = Client().get(reverse('posts:index'), {'page': 10})
+        content = response.content.decode()
+        self.assertEqual(content.count('class="page-link" href="?page='), 8)
+        for number in (1, 8, 9, 11, 12, 20):
+            self.assertIn(f'href="?page={number}"', content)
+        self.assertNotIn('href="?page=5"', content)
+        self.assertEqual(content.count('&hellip;'), 2)
@@ -0,0 +1,96 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post
+from ..paginators import PAGE_SIZE
+from ..search import TABLE, search_posts, stem_text
+
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='user')
+        cls.cats = Post.objects.create(
+            text='Коты любят спать на теплых подоконниках',
+            author=cls.user,
+        )
+        cls.dogs = Post.objects.create(
+            text='Собака гуляет во дворе, кот смотрит на собаку',
+            author=cls.user,
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        return self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+
+    def test_word_forms_are_found(self):
+        """Поиск находит другие формы слова"""
+        self.assertEqual(stem_text('Котов'), stem_text('коты'))
+        response = self.search('котов')
+        self.assertEqual(
+            set(response.context['page']), {SearchTest.cats, SearchTest.dogs}
+        )
+
+    def test_results_are_ranked(self):
+        """Записи с большим числом совпадений идут первыми"""
+        response = self.search('собаки')
+        self.assertEqual(list(response.context['page']), [SearchTest.dogs])
+        self.assertEqual(
+            list(search_posts('кот собака')), [SearchTest.dogs]
+        )
+
+    def test_empty_query(self):
+        """Пустой запрос ничего не находит"""
+        response = self.search('  ')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page'].paginator.count, 0)
+
+    def test_results_are_paginated(self):
+        """Результаты выводятся постранично, ссылки сохраняют запрос"""
+        Post.objects.bulk_create(
+            Post(text=f'Подоконник номер {i}', author=SearchTest.user)
+            for i in range(PAGE_SIZE + 1)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.search('подоконник', page=2)
+        self.assertEqual(response.context['page'].paginator.count, 12)
+        self.assertEqual(len(response.context['page']), 2)
+        self.assertContains(response, '?q=%D0%BF%D0%BE%D0%B4')
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении записи"""
+        post = Post.objects.create(text='Попугай', author=SearchTest.user)
+        self.assertEqual(list(search_posts('попугаи')), [post])
+        post.text = 'Черепаха'
+        post.save()
+        self.assertEqual(list(search_posts('попугай')), [])
+        self.assertEqual(list(search_posts('черепахи')), [post])
+        post.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {TABLE}')
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит записи по индексу"""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собакой'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [SearchTest.dogs]
+        )
@@ -0,0 +1,127 @@
+from io import BytesIO, StringIO
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Post
+from ..storage import image_storage
+from ..thumbnails import release_image, variants_dir
+
+
+User = get_user_model()
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR),
+    POSTS_THUMBNAIL_WORKERS=0,
+    POSTS_IMAGE_VARIANT_FORMATS=('jpeg',)
+)
+@mock.patch(
+    'posts.signals.transaction.on_commit', lambda callback: callback()
+)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='user')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ContentAddressedStorageTest.user)
+
+    @staticmethod
+    def get_image(name='image.png', color=(255, 0, 0)):
+        file_obj = BytesIO()
+        Image.new('RGB', size=(100, 50), color=color).save(file_obj, 'png')
+        return SimpleUploadedFile(
+            name, file_obj.getvalue(), content_type='image/png'
+        )
+
+    def create_post(self, text, image):
+        self.authorized_client.post(
+            reverse('posts:new_post'), data={'text': text, 'image': image}
+        )
+        return Post.objects.get(text=text)
+
+    def test_duplicate_uploads_share_file(self):
+        """Одинаковые изображения хранятся в одном файле"""
+        first = self.create_post('Первая', self.get_image('first.png'))
+        second = self.create_post('Вторая', self.get_image('second.png'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(len(list(image_storage.walk('posts'))), 1)
+        first.delete()
+        self.assertTrue(image_storage.exists(second.image.name))
+        second.delete()
+        self.assertFalse(image_storage.exists(second.image.name))
+        self.assertFalse(default_storage.exists(
+            f'{variants_dir(second.image.name)}/manifest.json'
+        ))
+
+    def test_reused_file_survives_concurrent_release(self):
+        """Файл, загруженный заново до фиксации записи, не удаляется"""
+        post = self.create_post('Запись', self.get_image())
+        with image_storage.open(post.image.name) as image_file:
+            content = ContentFile(image_file.read())
+        name = image_storage.save('posts/copy.png', content)
+        self.assertEqual(name, post.image.name)
+        post.delete()
+        self.assertTrue(image_storage.exists(name))
+        image_storage.confirm(name)
+        self.assertTrue(release_image(name))
+        self.assertFalse(image_storage.exists(name))
+
+    def test_replaced_image_is_released(self):
+        """Замененное изображение удаляется, если на него нет ссылок"""
+        post = self.create_post('Запись', self.get_image())
+        old_name = post.image.name
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={
+                'username': ContentAddressedStorageTest.user.username,
+                'post_id': post.id
+            }),
+            data={'text': 'Запись', 'image': self.get_image(color=(0, 0, 255))}
+        )
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertFalse(image_storage.exists(old_name))
+        self.assertTrue(image_storage.exists(post.image.name))
+
+    def test_gc_media_removes_orphans(self):
+        """Команда gc_media удаляет файлы, на которые не ссылаются записи"""
+        post = self.create_post('Запись', self.get_image())
+        orphan = image_storage.save('posts/orphan.png', ContentFile(b'data'))
+        call_command('gc_media', min_age=0, dry_run=True, stdout=StringIO())
+        self.assertTrue(image_storage.exists(orphan))
+        call_command('gc_media', min_age=0, stdout=StringIO())
+        self.assertFalse(image_storage.exists(orphan))
+        self.assertTrue(image_storage.exists(post.image.name))
+
+    def test_gc_media_removes_nested_variants(self):
+        """gc_media находит варианты во вложенных каталогах и чистит их"""
+        post = self.create_post('Запись', self.get_image())
+        orphan = variants_dir('posts/aa/bb/orphan.png')
+        default_storage.save(
+            f'{orphan}/manifest.json',
+            ContentFile(b'{"source": "posts/aa/bb/orphan.png"}')
+        )
+        call_command('gc_media', min_age=0, stdout=StringIO())
+        self.assertFalse(default_storage.exists(f'{orphan}/manifest.json'))
+        self.assertFalse(default_storage.exists(variants_dir('posts/aa')))
+        self.assertTrue(default_storage.exists(
+            variants_dir(post.image.name) + '/manifest.json'
+        ))
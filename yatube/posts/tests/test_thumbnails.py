@@ -0,0 +1,147 @@
+from io import BytesIO, StringIO
+import json
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Post
+from ..thumbnails import generate_variants, variants_dir, variants_lock
+
+
+User = get_user_model()
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR),
+    POSTS_THUMBNAIL_WORKERS=0
+)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='user')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ThumbnailTest.user)
+
+    @staticmethod
+    def get_image(name='image.png', size=(100, 50)):
+        file_obj = BytesIO()
+        Image.new('RGB', size=size, color=(255, 0, 0)).save(
+            file_obj, 'png'
+        )
+        return SimpleUploadedFile(
+            name, file_obj.getvalue(), content_type='image/png'
+        )
+
+    def test_thumbnail_created_on_upload(self):
+        """Миниатюра создается при публикации записи"""
+        self.authorized_client.post(reverse('posts:new_post'), data={
+            'text': 'Запись с изображением', 'image': self.get_image()
+        })
+        post = Post.objects.get(text='Запись с изображением')
+        self.assertTrue(post.thumbnail)
+        with mock.patch('sorl.thumbnail.get_thumbnail') as get_thumbnail:
+            response = self.authorized_client.get(reverse('posts:index'))
+        get_thumbnail.assert_not_called()
+        self.assertContains(response, post.thumbnail)
+
+    def test_pending_thumbnail_shows_placeholder(self):
+        """Пока миниатюры нет, вместо оригинала выводится заглушка"""
+        post = Post.objects.create(
+            text='Текст', author=ThumbnailTest.user, image='posts/pending.png'
+        )
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, post.image.url)
+        self.assertContains(response, 'Изображение обрабатывается')
+
+    def test_thumbnail_replaced_on_edit(self):
+        """Замена изображения пересоздает миниатюру"""
+        post = Post.objects.create(
+            text='Текст', author=ThumbnailTest.user, thumbnail='/old.jpg'
+        )
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={
+                'username': ThumbnailTest.user.username, 'post_id': post.id
+            }),
+            data={'text': 'Текст', 'image': self.get_image('new.png')}
+        )
+        post.refresh_from_db()
+        self.assertNotEqual(post.thumbnail, '/old.jpg')
+        self.assertTrue(post.thumbnail)
+
+    def test_warm_thumbnails_command(self):
+        """Команда warm_thumbnails создает недостающие миниатюры"""
+        post = Post.objects.create(
+            text='Текст', author=ThumbnailTest.user, image=self.get_image()
+        )
+        Post.objects.create(text='Без изображения', author=ThumbnailTest.user)
+        call_command('warm_thumbnails', workers=0, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail)
+
+    @override_settings(
+        POSTS_IMAGE_VARIANT_WIDTHS=(320, 640, 960),
+        POSTS_IMAGE_VARIANT_FORMATS=('webp', 'jpeg')
+    )
+    def test_responsive_variants(self):
+        """Для изображения создаются варианты разной ширины и формата"""
+        self.authorized_client.post(reverse('posts:new_post'), data={
+            'text': 'Запись с вариантами',
+            'image': self.get_image(size=(700, 300))
+        })
+        post = Post.objects.get(text='Запись с вариантами')
+        self.assertEqual(set(post.variants), {'webp', 'jpeg'})
+        self.assertEqual(
+            [variant['width'] for variant in post.variants['webp']],
+            [320, 640]
+        )
+        manifest = json.loads(default_storage.open(
+            f'{variants_dir(post.image.name)}/manifest.json'
+        ).read())
+        self.assertEqual(manifest['variants'], post.variants)
+        for variant in post.variants['webp']:
+            path = variant['url'][len(settings.MEDIA_URL):]
+            with default_storage.open(path) as image_file:
+                image = Image.open(image_file)
+                self.assertEqual(image.format, 'WEBP')
+                self.assertEqual(image.width, variant['width'])
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, post.image_srcset)
+
+    def test_variants_dir_uses_full_image_name(self):
+        """Файлы с одинаковым именем и разным расширением не пересекаются"""
+        self.assertNotEqual(
+            variants_dir('posts/cat.jpg'), variants_dir('posts/cat.png')
+        )
+
+    def test_variants_wait_for_lock(self):
+        """Варианты не пишутся, пока их пишет другой обработчик"""
+        post = Post.objects.create(
+            text='Текст', author=ThumbnailTest.user, image=self.get_image()
+        )
+        with variants_lock(post.image.name), mock.patch.multiple(
+            'posts.thumbnails',
+            VARIANTS_LOCK_TIMEOUT=0, VARIANTS_LOCK_WAIT=0
+        ):
+            with self.assertRaises(TimeoutError):
+                generate_variants(post, force=True)
+        self.assertTrue(generate_variants(post)['variants'])
@@ -0,0 +1,205 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+from ..search import search_posts
+
+
+User = get_user_model()
+
+
+class TransferTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.user = User.objects.create(username='user')
+        cls.author = User.objects.create(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def path(self, name):
+        return os.path.join(TransferTest.directory, name)
+
+    def write(self, name, text):
+        with open(self.path(name), 'w', encoding='utf-8') as file_obj:
+            file_obj.write(text)
+        return self.path(name)
+
+    def call(self, command, *args, **options):
+        out, err = StringIO(), StringIO()
+        call_command(command, *args, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_round_trip(self):
+        """Выгруженные данные загружаются обратно с теми же датами"""
+        Follow.objects.create(
+            user=TransferTest.user, author=TransferTest.author
+        )
+        for i, file_format in enumerate(('jsonl', 'csv')):
+            post = Post.objects.create(
+                text=f'Запись {i}', author=TransferTest.author,
+                group=TransferTest.group
+            )
+            Comment.objects.create(
+                post=post, author=TransferTest.user, text='Комментарий'
+            )
+            dates = list(Post.objects.values_list('pk', 'pub_date'))
+            for kind in ('posts', 'comments'):
+                self.call(
+                    'export_posts', self.path(f'{kind}.{file_format}'),
+                    kind=kind
+                )
+            Post.objects.all().delete()
+            for kind in ('posts', 'comments'):
+                self.call(
+                    'import_posts', self.path(f'{kind}.{file_format}'),
+                    kind=kind
+                )
+            self.assertEqual(
+                list(Post.objects.values_list('pk', 'pub_date')), dates
+            )
+            self.assertEqual(Comment.objects.count(), i + 1)
+            self.assertEqual(
+                Post.objects.get(pk=post.pk).comment_count, 1
+            )
+        author = User.objects.get(username='author')
+        self.assertEqual(author.stats.posts_count, 2)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=TransferTest.user).count(), 2
+        )
+        self.assertEqual(len(search_posts('запись')), 2)
+
+    def test_import_resolves_and_reports(self):
+        """Неизвестные пользователи создаются, ошибочные строки пропускаются"""
+        path = self.write('posts.jsonl', '\n'.join((
+            '{"author": "new", "text": "Первая", '
+            '"pub_date": "2020-01-02T03:04:05"}',
+            '{"author": "author", "group": "missing", "text": "Вторая"}',
+            'not json',
+            '{"author": "author", "text": "Третья", "group": "group"}',
+        )))
+        out, err = self.call(
+            'import_posts', path, create_users=True, batch_size=2
+        )
+        self.assertIn('Загружено строк: 2, пропущено: 2', out)
+        self.assertIn('Строка 2', err)
+        self.assertIn('Строка 3', err)
+        post = Post.objects.get(text='Первая')
+        self.assertEqual(post.author.username, 'new')
+        self.assertEqual(post.author.stats.posts_count, 1)
+        self.assertEqual(
+            post.pub_date,
+            timezone.make_aware(datetime(2020, 1, 2, 3, 4, 5), timezone.utc)
+        )
+        self.assertEqual(
+            Post.objects.get(text='Третья').group, TransferTest.group
+        )
+
+    def test_import_follows(self):
+        """Подписки загружаются без повторов и заполняют ленту"""
+        Post.objects.create(text='Запись', author=TransferTest.author)
+        path = self.write(
+            'follows.csv',
+            'user,author\nuser,author\nuser,author\nuser,user\n'
+        )
+        out, err = self.call('import_posts', path, kind='follows')
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertIn(
+            'Загружено строк: 1, пропущено: 1, уже в базе: 1', out
+        )
+        self.assertIn('Строка 3', err)
+        self.assertEqual(TransferTest.author.stats.followers_count, 0)
+        author = User.objects.get(username='author')
+        self.assertEqual(author.stats.followers_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=TransferTest.user).count(), 1
+        )
+
+    def test_reimport_counts_only_new_rows(self):
+        """Повторная загрузка не считает существующие строки и не чистит кэш"""
+        Post.objects.create(text='Запись', author=TransferTest.author)
+        path = self.path('posts.jsonl')
+        self.call('export_posts', path)
+        cache.set('unrelated', 1)
+        out, _ = self.call('import_posts', path)
+        self.assertIn('Загружено строк: 0, пропущено: 0, уже в базе: 1', out)
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(cache.get('unrelated'), 1)
+
+
+class ProfileExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='user')
+        cls.author = User.objects.create(username='author')
+        cls.post = Post.objects.create(text='Запись', author=cls.user)
+        Post.objects.create(text='Чужая запись', author=cls.author)
+        Comment.objects.create(post=cls.post, author=cls.user, text='Мой')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ProfileExportTest.user)
+
+    def export(self, username='user', **params):
+        return self.authorized_client.get(
+            reverse('posts:profile_export', args=[username]), params
+        )
+
+    def test_export_streams_own_data(self):
+        """Выгрузка отдается потоком и содержит только данные пользователя"""
+        response = self.export(kind='posts')
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename="user-posts.jsonl"'
+        )
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['text'] for line in lines], ['Запись']
+        )
+        response = self.export(kind='follows', format='csv')
+        self.assertEqual(
+            b''.join(response.streaming_content).decode(),
+            'user,author\r\nuser,author\r\n'
+        )
+        response = self.export(kind='comments', format='csv')
+        self.assertEqual(
+            b''.join(response.streaming_content).decode().count('Мой'), 1
+        )
+
+    def test_export_is_private(self):
+        """Чужие данные не выгружаются, неизвестный формат — 404"""
+        response = self.export('author')
+        self.assertRedirects(
+            response, reverse('posts:profile', args=['author'])
+        )
+        self.assertEqual(self.export(format='xml').status_code, 404)
+        response = self.authorized_client.get(
+            reverse('posts:profile', args=['user'])
+        )
+        self.assertContains(
+            response,
+            reverse('posts:profile_export', args=['user'])
+            + '?kind=posts&amp;format=csv'
+        )
@@ -1,17 +1,23 @@
 from collections import namedtuple
+from io import StringIO
 import shutil
 import tempfile
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.core.paginator import Page
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from ..models import Comment, Follow, Group, Post, TimelineEntry, UserStats
 from ..forms import PostForm
+from ..paginators import COMMENTS_PAGE_SIZE
 
 User = get_user_model()
 
@@ -355,3 +361,376 @@ class FollowTest(TestCase):
         response = self.follower_client.get(reverse(
             FollowTest.urls['posts:follow_index'].alias))
         self.assertGreater(len(response.context['page']), 0)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='user')
+        cls.follower = User.objects.create(username='follower')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Описание тестовой группы'
+        )
+        Follow.objects.create(user=cls.follower, author=cls.user)
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+            reverse('posts:follow_index'),
+        )
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(FeedQueriesTest.follower)
+        cache.clear()
+
+    def create_posts(self, number):
+        for _ in range(number):
+            post = Post.objects.create(
+                text='Текст тестовой записи',
+                author=FeedQueriesTest.user,
+                group=FeedQueriesTest.group
+            )
+            Comment.objects.create(
+                post=post, author=FeedQueriesTest.follower, text='Комментарий'
+            )
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            self.follower_client.get(url)
+        return len(context)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Количество запросов ленты не зависит от числа записей"""
+        self.create_posts(1)
+        single = {url: self.count_queries(url) for url in self.urls}
+        self.create_posts(9)
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), single[url])
+
+    def test_feed_shows_comment_count(self):
+        """Лента выводит количество комментариев к записи"""
+        self.create_posts(1)
+        response = self.follower_client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page'][0].comment_count, 1)
+        self.assertContains(response, 'Комментариев: 1')
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [
+            User.objects.create(username=f'user{number}')
+            for number in range(3)
+        ]
+        cls.post = Post.objects.create(text='Текст', author=cls.users[0])
+        Comment.objects.bulk_create([
+            Comment(
+                post=cls.post, author=cls.users[number % 3],
+                text=f'Комментарий {number}'
+            )
+            for number in range(25)
+        ])
+        Post.objects.filter(pk=cls.post.pk).recount_comments()
+        cls.expected = list(cls.post.comments.order_by(
+            'created', 'id'
+        ).values_list('id', flat=True))
+        cls.url = reverse('posts:post', kwargs={
+            'username': cls.users[0].username, 'post_id': cls.post.id
+        })
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_page_shows_first_batch(self):
+        """На странице записи выводится первая порция комментариев"""
+        response = Client().get(CommentPaginationTest.url)
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.id for comment in comments],
+            CommentPaginationTest.expected[:COMMENTS_PAGE_SIZE]
+        )
+        self.assertTrue(response.context['comments_page'].has_next())
+        self.assertContains(response, 'Показать еще комментарии')
+
+    def test_comment_queries_do_not_depend_on_authors(self):
+        """Авторы комментариев загружаются вместе с комментариями"""
+        with CaptureQueriesContext(connection) as context:
+            Client().get(CommentPaginationTest.url)
+        author_queries = [
+            query for query in context.captured_queries
+            if 'FROM "auth_user" WHERE "auth_user"."id" =' in query['sql']
+        ]
+        self.assertEqual(author_queries, [])
+
+    def test_fragment_returns_next_batch(self):
+        """Следующая порция комментариев отдается фрагментом HTML"""
+        first = Client().get(CommentPaginationTest.url)
+        response = Client().get(
+            reverse('posts:post_comments', kwargs={
+                'username': CommentPaginationTest.users[0].username,
+                'post_id': CommentPaginationTest.post.id
+            }),
+            {'cursor': first.context['comments_page'].next_cursor}
+        )
+        self.assertEqual(
+            [comment.id for comment in response.context['comments']],
+            CommentPaginationTest.expected[COMMENTS_PAGE_SIZE:]
+        )
+        self.assertNotContains(response, '<html')
+        self.assertNotContains(response, 'Показать еще комментарии')
+
+
+class PostViewQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.follower = User.objects.create(username='follower')
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        cls.post = Post.objects.create(text='Текст', author=cls.author)
+        cls.url = reverse('posts:post', kwargs={
+            'username': cls.author.username, 'post_id': cls.post.id
+        })
+
+    def setUp(self):
+        cache.clear()
+        self.follower_client = Client()
+        self.follower_client.force_login(PostViewQueriesTest.follower)
+
+    def add_comments(self, number):
+        start = User.objects.count()
+        for index in range(start, start + number):
+            user = User.objects.create(username=f'commenter{index}')
+            Comment.objects.create(
+                post=PostViewQueriesTest.post, author=user, text='Текст'
+            )
+
+    def test_post_page_queries_are_locked(self):
+        """Страница записи: запись с автором и подпиской, затем комментарии"""
+        self.add_comments(5)
+        with self.assertNumQueries(2):
+            Client().get(PostViewQueriesTest.url)
+        with self.assertNumQueries(4):
+            response = self.follower_client.get(PostViewQueriesTest.url)
+        self.assertTrue(response.context['following'])
+        self.assertEqual(response.context['posts_count'], 1)
+        self.assertContains(response, 'Подписчиков: 1')
+
+    def test_post_page_queries_do_not_depend_on_comments(self):
+        """Количество запросов не растет с числом комментариев"""
+        self.add_comments(1)
+        with CaptureQueriesContext(connection) as single:
+            self.follower_client.get(PostViewQueriesTest.url)
+        self.add_comments(10)
+        cache.clear()
+        with CaptureQueriesContext(connection) as many:
+            self.follower_client.get(PostViewQueriesTest.url)
+        self.assertEqual(len(many), len(single))
+
+    def test_not_modified_skips_comments(self):
+        """Ответ 304 не загружает комментарии"""
+        etag = Client().get(PostViewQueriesTest.url)['ETag']
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = Client().get(
+                PostViewQueriesTest.url, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(POSTS_FANOUT_FOLLOWER_LIMIT=1, POSTS_TIMELINE_WORKERS=0)
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.celebrity = User.objects.create(username='celebrity')
+        cls.reader = User.objects.create(username='reader')
+        cls.fan = User.objects.create(username='fan')
+        Follow.objects.create(user=cls.fan, author=cls.celebrity)
+        cls.old_post = Post.objects.create(
+            text='Запись до подписки', author=cls.author
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(TimelineTest.reader)
+
+    def get_feed(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return [post.text for post in response.context['page']]
+
+    def test_follow_backfills_and_unfollow_trims_timeline(self):
+        """Подписка заполняет ленту, а отписка очищает ее"""
+        reader, author = TimelineTest.reader, TimelineTest.author
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': author.username}
+        ))
+        self.assertEqual(self.get_feed(), [TimelineTest.old_post.text])
+        Post.objects.create(text='Новая запись', author=author)
+        self.assertEqual(
+            reader.timeline.filter(author=author).count(), 2
+        )
+        self.assertEqual(
+            self.get_feed(), ['Новая запись', TimelineTest.old_post.text]
+        )
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': author.username}
+        ))
+        self.assertFalse(reader.timeline.exists())
+        self.assertEqual(self.get_feed(), [])
+
+    def test_celebrity_posts_are_read_on_demand(self):
+        """Записи популярных авторов не рассылаются по лентам"""
+        reader, celebrity = TimelineTest.reader, TimelineTest.celebrity
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': celebrity.username}
+        ))
+        Post.objects.create(text='Запись знаменитости', author=celebrity)
+        self.assertFalse(reader.timeline.filter(author=celebrity).exists())
+        self.assertEqual(self.get_feed(), ['Запись знаменитости'])
+
+    def test_large_backfill_and_fan_out(self):
+        """Подписка на автора с 600 записями и запись для 600 подписчиков"""
+        author = User.objects.create(username='prolific')
+        Post.objects.bulk_create(
+            Post(text=f'Запись {number}', author=author)
+            for number in range(600)
+        )
+        with self.settings(POSTS_FANOUT_FOLLOWER_LIMIT=10000):
+            response = self.reader_client.get(reverse(
+                'posts:profile_follow', kwargs={'username': author.username}
+            ))
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(TimelineTest.reader.timeline.count(), 600)
+            User.objects.bulk_create(
+                User(username=f'follower{number}') for number in range(600)
+            )
+            followers = User.objects.filter(username__startswith='follower')
+            Follow.objects.bulk_create(
+                Follow(user=user, author=author) for user in followers
+            )
+            Post.objects.create(text='Для всех', author=author)
+        self.assertEqual(
+            TimelineEntry.objects.filter(post__text='Для всех').count(), 601
+        )
+
+    def test_celebrity_posts_stay_in_feed_below_limit(self):
+        """Записи, опубликованные сверх лимита, остаются в ленте после него"""
+        reader, celebrity = TimelineTest.reader, TimelineTest.celebrity
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': celebrity.username}
+        ))
+        Post.objects.create(text='Запись знаменитости', author=celebrity)
+        Follow.objects.filter(user=TimelineTest.fan).delete()
+        self.assertTrue(reader.timeline.filter(author=celebrity).exists())
+        self.assertIsNone(
+            UserStats.objects.get(user=celebrity).celebrity_since
+        )
+        self.assertEqual(self.get_feed(), ['Запись знаменитости'])
+
+    @override_settings(POSTS_TIMELINE_WORKERS=1)
+    def test_celebrity_posts_read_until_backfill(self):
+        """До заполнения лент записи бывшей знаменитости читаются напрямую"""
+        reader, celebrity = TimelineTest.reader, TimelineTest.celebrity
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': celebrity.username}
+        ))
+        Post.objects.create(text='Запись знаменитости', author=celebrity)
+        Follow.objects.filter(user=TimelineTest.fan).delete()
+        self.assertFalse(reader.timeline.filter(author=celebrity).exists())
+        self.assertEqual(self.get_feed(), ['Запись знаменитости'])
+        call_command('backfill_timelines', stdout=StringIO())
+        self.assertTrue(reader.timeline.filter(author=celebrity).exists())
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='user')
+        cls.follower = User.objects.create(username='follower')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Описание тестовой группы'
+        )
+        Follow.objects.create(user=cls.follower, author=cls.user)
+        cls.post = Post.objects.create(
+            text='Текст тестовой записи', author=cls.user, group=cls.group
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+            reverse('posts:post', kwargs={
+                'username': cls.user.username, 'post_id': cls.post.id
+            }),
+            reverse('posts:follow_index'),
+        )
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(ConditionalGetTest.follower)
+
+    def test_matching_etag_returns_not_modified_without_render(self):
+        """Страница с неизменным ETag отдается как 304 без рендеринга"""
+        for url in ConditionalGetTest.urls:
+            with self.subTest(url=url):
+                response = self.follower_client.get(url)
+                self.assertNotIn('Last-Modified', response)
+                response = self.follower_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+
+    def test_follow_is_not_hidden_by_if_modified_since(self):
+        """После подписки страница автора не отдается как 304 по дате"""
+        reader = Client()
+        reader.force_login(User.objects.create(username='reader'))
+        url = ConditionalGetTest.urls[2]
+        reader.get(url)
+        reader.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': ConditionalGetTest.user.username}
+        ))
+        response = reader.get(
+            url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['following'])
+
+    @override_settings(POSTS_PAGINATION={'index': 'cursor'})
+    def test_cursor_page_etag_skips_count(self):
+        """ETag страницы по курсору считается без COUNT"""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.follower_client.get(reverse('posts:index'))
+        self.assertIn('ETag', response)
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in queries.captured_queries
+        ))
+
+    def test_etag_changes_with_content(self):
+        """ETag меняется после комментария и зависит от пользователя"""
+        url = ConditionalGetTest.urls[3]
+        etag = self.follower_client.get(url)['ETag']
+        author_client = Client()
+        author_client.force_login(ConditionalGetTest.user)
+        self.assertNotEqual(author_client.get(url)['ETag'], etag)
+        Comment.objects.create(
+            post=ConditionalGetTest.post,
+            author=ConditionalGetTest.follower,
+            text='Комментарий'
+        )
+        response = self.follower_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+from sorl.thumbnail import delete, get_thumbnail
+
+from .cache import purge_pages
+from .models import Post
+from .storage import cache_lock, name_digest
+
+
+logger = logging.getLogger(__name__)
+
+
+THUMBNAIL_GEOMETRY = '960x339'
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+THUMBNAIL_RATIO = 339 / 960
+VARIANTS_DIR = 'variants'
+VARIANTS_LOCK_TIMEOUT = 60
+VARIANTS_LOCK_WAIT = 0.1
+VARIANT_FORMATS = {
+    'avif': ('AVIF', 'image/avif'),
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.POSTS_THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails'
+        )
+    return _executor
+
+
+def supported_formats():
+    extensions = Image.registered_extensions()
+    return [
+        name for name in settings.POSTS_IMAGE_VARIANT_FORMATS
+        if VARIANT_FORMATS[name][0] in extensions.values()
+    ]
+
+
+def variants_dir(image_name):
+    return f'{VARIANTS_DIR}/{image_name}'
+
+
+def variants_lock(image_name):
+    """Не дает двум обработчикам одновременно менять варианты файла.
+
+    Блокировка берется через cache.add, как в PageCacheMiddleware, и
+    поэтому действует для всех процессов с общим кэшем.
+    """
+    return cache_lock(
+        'variants-lock:' + name_digest(image_name), VARIANTS_LOCK_TIMEOUT,
+        VARIANTS_LOCK_WAIT
+    )
+
+
+def remove_variants(directory):
+    if not default_storage.exists(directory):
+        return
+    for name in default_storage.listdir(directory)[1]:
+        default_storage.delete(f'{directory}/{name}')
+
+
+def load_manifest(directory):
+    path = f'{directory}/manifest.json'
+    if not default_storage.exists(path):
+        return None
+    try:
+        with default_storage.open(path) as manifest_file:
+            return json.load(manifest_file)
+    except ValueError:
+        return None
+
+
+def read_manifest(image_name):
+    manifest = load_manifest(variants_dir(image_name))
+    if manifest is None or manifest.get('source') != image_name:
+        return None
+    return manifest
+
+
+def generate_variants(post, force=False):
+    """Создает набор изображений разной ширины и форматов и манифест.
+
+    Варианты общие для всех записей с одним и тем же файлом изображения,
+    поэтому повторная загрузка того же файла использует готовый манифест.
+    Пока одна запись пишет варианты, другие ждут и берут ее манифест.
+    """
+    with variants_lock(post.image.name):
+        if not force:
+            manifest = read_manifest(post.image.name)
+            if manifest is not None:
+                return manifest
+        remove_variants(variants_dir(post.image.name))
+        return write_variants(post.image)
+
+
+def write_variants(image):
+    with image.open('rb') as image_file:
+        source = ImageOps.exif_transpose(Image.open(image_file))
+        source = source.convert('RGB')
+    widths = [
+        width for width in settings.POSTS_IMAGE_VARIANT_WIDTHS
+        if width <= source.width
+    ] or settings.POSTS_IMAGE_VARIANT_WIDTHS[:1]
+    directory = variants_dir(image.name)
+    stem = os.path.splitext(os.path.basename(image.name))[0]
+    manifest = {'source': image.name, 'variants': {}}
+    for width in widths:
+        height = round(width * THUMBNAIL_RATIO)
+        resized = ImageOps.fit(source, (width, height), Image.LANCZOS)
+        for name in supported_formats():
+            buffer = BytesIO()
+            resized.save(buffer, VARIANT_FORMATS[name][0], quality=80)
+            path = default_storage.save(
+                f'{directory}/{stem}-{width}.{name}',
+                ContentFile(buffer.getvalue())
+            )
+            manifest['variants'].setdefault(name, []).append(
+                {'width': width, 'url': default_storage.url(path)}
+            )
+    default_storage.save(
+        f'{directory}/manifest.json',
+        ContentFile(json.dumps(manifest).encode())
+    )
+    return manifest
+
+
+def generate_thumbnail(post_id, force=False):
+    """Создает миниатюру и варианты изображения записи."""
+    post = Post.objects.filter(pk=post_id).only(
+        'image', 'author_id', 'group_id'
+    ).first()
+    if post is None or not post.image:
+        return None
+    url = get_thumbnail(
+        post.image, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS
+    ).url
+    manifest = generate_variants(post, force)
+    Post.objects.filter(pk=post_id, image=post.image.name).update(
+        thumbnail=url, image_variants=json.dumps(manifest['variants']),
+        updated=timezone.now()
+    )
+    purge_pages((post.author_id,), (post.group_id,))
+    return url
+
+
+def run_in_worker(post_id, force=False):
+    try:
+        return generate_thumbnail(post_id, force)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру записи %s', post_id)
+    finally:
+        connection.close()
+
+
+def schedule_thumbnail(post):
+    if not post.image:
+        return
+    if not getattr(settings, 'POSTS_THUMBNAIL_WORKERS', 0):
+        generate_thumbnail(post.pk)
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(run_in_worker, post.pk)
+    )
+
+
+def is_recent(storage, name, min_age):
+    threshold = timezone.now() - timedelta(seconds=min_age)
+    return storage.get_modified_time(name) > threshold
+
+
+def release_image(name, min_age=None):
+    """Удаляет файл изображения, его миниатюры и варианты.
+
+    Файл общий для записей с одинаковым содержимым, поэтому он удаляется,
+    только когда на него не ссылается ни одна запись и никто не загружает
+    его заново прямо сейчас. Без min_age об этом говорит отметка загрузки,
+    с min_age — время изменения файла.
+    """
+    if not name:
+        return False
+    image = Post(image=name).image
+    storage = image.storage
+    with storage.lock(name):
+        if Post.objects.filter(image=name).exists():
+            return False
+        try:
+            exists = storage.exists(name)
+        except SuspiciousFileOperation:
+            return False
+        if min_age is None:
+            if storage.is_pending(name):
+                return False
+        elif exists and is_recent(storage, name, min_age):
+            return False
+        if exists:
+            delete(image)
+    with variants_lock(name):
+        remove_variants(variants_dir(name))
+    return True
@@ -0,0 +1,68 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import TimelineEntry, UserStats, fan_out_limit
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.POSTS_TIMELINE_WORKERS,
+            thread_name_prefix='timelines'
+        )
+    return _executor
+
+
+def pause_fan_out(author_id):
+    """Запоминает, с какого момента записи автора не рассылаются."""
+    UserStats.objects.filter(
+        user_id=author_id, followers_count__gt=fan_out_limit(),
+        celebrity_since__isnull=True
+    ).update(celebrity_since=timezone.now())
+
+
+def resume_fan_out(author_id):
+    """Раскладывает записи, пропущенные сверх лимита, и снимает отметку.
+
+    Пока отметка стоит, лента подписок читает записи автора напрямую,
+    поэтому до конца заполнения они из нее не пропадают.
+    """
+    since = UserStats.objects.filter(
+        user_id=author_id, followers_count__lte=fan_out_limit()
+    ).values_list('celebrity_since', flat=True).first()
+    if since is None:
+        return False
+    TimelineEntry.objects.backfill_followers(author_id, since)
+    UserStats.objects.filter(
+        user_id=author_id, celebrity_since=since,
+        followers_count__lte=fan_out_limit()
+    ).update(celebrity_since=None)
+    return True
+
+
+def run_in_worker(author_id):
+    try:
+        return resume_fan_out(author_id)
+    except Exception:
+        logger.exception('Не удалось заполнить ленты автора %s', author_id)
+    finally:
+        connection.close()
+
+
+def schedule_resume(author_id):
+    if not getattr(settings, 'POSTS_TIMELINE_WORKERS', 0):
+        resume_fan_out(author_id)
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(run_in_worker, author_id)
+    )
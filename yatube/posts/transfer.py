@@ -0,0 +1,409 @@
+import csv
+import json
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import search
+from .cache import invalidate_post_cards, purge_page_cache
+from .models import (Comment, Follow, Group, Post, TimelineEntry, UserStats,
+                     fan_out_limit)
+from .paginators import bump_author_version, count_cache_key
+from .timelines import pause_fan_out
+
+
+User = get_user_model()
+
+JSONL = 'jsonl'
+CSV = 'csv'
+FORMATS = (JSONL, CSV)
+BATCH_SIZE = 1000
+
+FIELDS = {
+    'posts': {
+        'id': 'id',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'image': 'image',
+    },
+    'comments': {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    },
+    'follows': {
+        'user': 'user__username',
+        'author': 'author__username',
+    },
+}
+MODELS = {'posts': Post, 'comments': Comment, 'follows': Follow}
+
+
+class InvalidRecord(Exception):
+    pass
+
+
+def guess_format(path):
+    return CSV if path.lower().endswith('.csv') else JSONL
+
+
+def read_records(file_obj, file_format):
+    """Перебирает словари из JSON Lines или CSV, не читая файл целиком."""
+    if file_format == CSV:
+        for record in csv.DictReader(file_obj):
+            yield {key: value for key, value in record.items() if value}
+        return
+    for line in file_obj:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            yield InvalidRecord(f'неверный JSON: {error}')
+            continue
+        if not isinstance(record, dict):
+            yield InvalidRecord('строка должна быть объектом')
+            continue
+        yield record
+
+
+# Поле, по которому выбираются данные одного пользователя.
+USER_FIELDS = {'posts': 'author', 'comments': 'author', 'follows': 'user'}
+CONTENT_TYPES = {
+    JSONL: 'application/x-ndjson; charset=utf-8',
+    CSV: 'text/csv; charset=utf-8',
+}
+
+
+def export_rows(kind, batch_size=BATCH_SIZE, user=None):
+    """Строки values_list по возрастанию id, читаемые пачками."""
+    rows = MODELS[kind].objects.order_by('pk')
+    if user is not None:
+        rows = rows.filter(**{USER_FIELDS[kind]: user})
+    return rows.values_list(*FIELDS[kind].values()).iterator(
+        chunk_size=batch_size
+    )
+
+
+def export_value(value):
+    # Даты с микросекундами: по ним строятся курсоры постраничного вывода.
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class Echo:
+    """Буфер для csv.writer, который возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def serialize(file_format, kind, rows):
+    """Перебирает строки файла, не накапливая их в памяти."""
+    names = list(FIELDS[kind])
+    if file_format == CSV:
+        writer = csv.writer(Echo())
+        yield writer.writerow(names)
+        for row in rows:
+            yield writer.writerow([export_value(value) for value in row])
+        return
+    for row in rows:
+        yield json.dumps(
+            {name: export_value(value) for name, value in zip(names, row)},
+            ensure_ascii=False
+        ) + '\n'
+
+
+def write_records(file_obj, file_format, kind, rows):
+    """Пишет строки values_list в файл и возвращает их количество."""
+    count = -1 if file_format == CSV else 0
+    for line in serialize(file_format, kind, rows):
+        file_obj.write(line)
+        count += 1
+    return count
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise InvalidRecord(f'неверная дата {value!r}')
+    if settings.USE_TZ and timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+def parse_id(value, name='id'):
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        raise InvalidRecord(f'неверный {name} {value!r}')
+
+
+def require(record, name):
+    value = record.get(name)
+    if value in (None, ''):
+        raise InvalidRecord(f'нет поля {name}')
+    return str(value)
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает auto_now и auto_now_add, чтобы сохранить даты из файла."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Importer:
+    """Загружает записи, комментарии и подписки пачками через bulk_create.
+
+    Авторы и группы ищутся по словарям в памяти, которые дополняются одним
+    запросом на пачку. bulk_create не вызывает сигналы, поэтому счетчики,
+    ленты подписок, поисковый индекс и кэш обновляются в finish() — только
+    для затронутых авторов, групп и записей.
+    """
+
+    def __init__(self, kind, batch_size=BATCH_SIZE, create_users=False):
+        self.kind = kind
+        self.batch_size = batch_size
+        self.create_users = create_users
+        self.users = {}
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        # Авторы новых записей и подписок.
+        self.authors = set()
+        # Пользователи, у которых изменились счетчики UserStats.
+        self.counted_users = set()
+        self.group_ids = set()
+        # Записи, к которым добавлены комментарии.
+        self.post_ids = set()
+        self.imported = 0
+        self.duplicates = 0
+        self.errors = []
+
+    def run(self, records):
+        batch = []
+        for number, record in enumerate(records, 1):
+            batch.append((number, record))
+            if len(batch) == self.batch_size:
+                self.load(batch)
+                batch = []
+        if batch:
+            self.load(batch)
+        return self.imported
+
+    def resolve_users(self, names):
+        missing = set(names) - self.users.keys()
+        if not missing:
+            return
+        if self.create_users:
+            User.objects.bulk_create(
+                [User(username=name, password=make_password(None))
+                 for name in missing],
+                ignore_conflicts=True
+            )
+        self.users.update(
+            User.objects.filter(username__in=missing).values_list(
+                'username', 'pk'
+            )
+        )
+
+    def user_id(self, record, name):
+        username = require(record, name)
+        if username not in self.users:
+            raise InvalidRecord(f'нет пользователя {username!r}')
+        return self.users[username]
+
+    def build_post(self, record):
+        slug = record.get('group')
+        if slug and slug not in self.groups:
+            raise InvalidRecord(f'нет группы {slug!r}')
+        pub_date = parse_date(record.get('pub_date'))
+        return Post(
+            id=parse_id(record.get('id')),
+            author_id=self.user_id(record, 'author'),
+            group_id=self.groups.get(slug) if slug else None,
+            text=require(record, 'text'),
+            pub_date=pub_date,
+            updated=pub_date,
+            image=record.get('image') or None,
+        )
+
+    def build_comment(self, record, post_ids):
+        post_id = parse_id(require(record, 'post'), 'post')
+        if post_id not in post_ids:
+            raise InvalidRecord(f'нет записи {post_id}')
+        return Comment(
+            id=parse_id(record.get('id')),
+            post_id=post_id,
+            author_id=self.user_id(record, 'author'),
+            text=require(record, 'text'),
+            created=parse_date(record.get('created')),
+        )
+
+    def build_follow(self, record):
+        user_id = self.user_id(record, 'user')
+        author_id = self.user_id(record, 'author')
+        if user_id == author_id:
+            raise InvalidRecord('нельзя подписаться на себя')
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def build(self, record, post_ids):
+        if isinstance(record, InvalidRecord):
+            raise record
+        if self.kind == 'posts':
+            return self.build_post(record)
+        if self.kind == 'comments':
+            return self.build_comment(record, post_ids)
+        return self.build_follow(record)
+
+    def load(self, batch):
+        records = [
+            record for _, record in batch if isinstance(record, dict)
+        ]
+        post_ids = set()
+        with transaction.atomic():
+            self.resolve_users(
+                str(record[name]) for record in records
+                for name in ('author', 'user') if record.get(name)
+            )
+            if self.kind == 'comments':
+                post_ids = set(Post.objects.filter(pk__in=[
+                    record['post'] for record in records
+                    if str(record.get('post', '')).isdigit()
+                ]).values_list('pk', flat=True))
+            objects = []
+            for number, record in batch:
+                try:
+                    objects.append(self.build(record, post_ids))
+                except InvalidRecord as error:
+                    self.errors.append((number, str(error)))
+            unique = self.skip_existing(objects)
+            self.duplicates += len(objects) - len(unique)
+            objects = unique
+            with explicit_dates(
+                Post._meta.get_field('pub_date'),
+                Post._meta.get_field('updated'),
+                Comment._meta.get_field('created'),
+            ):
+                MODELS[self.kind].objects.bulk_create(
+                    objects, ignore_conflicts=True
+                )
+        self.track(objects)
+        self.imported += len(objects)
+
+    def skip_existing(self, objects):
+        """Убирает строки, которые уже есть в базе или в пачке.
+
+        bulk_create(ignore_conflicts=True) не сообщает, сколько строк он
+        пропустил, поэтому конфликты отбрасываются до вставки.
+        """
+        if self.kind == 'follows':
+            existing = set(Follow.objects.filter(
+                user_id__in={obj.user_id for obj in objects},
+                author_id__in={obj.author_id for obj in objects},
+            ).values_list('user_id', 'author_id'))
+
+            def key(obj):
+                return obj.user_id, obj.author_id
+        else:
+            existing = set(MODELS[self.kind].objects.filter(pk__in=[
+                obj.id for obj in objects if obj.id is not None
+            ]).values_list('pk', flat=True))
+
+            def key(obj):
+                return obj.id
+        unique = []
+        for obj in objects:
+            obj_key = key(obj)
+            if obj_key is None:
+                unique.append(obj)
+            elif obj_key not in existing:
+                existing.add(obj_key)
+                unique.append(obj)
+        return unique
+
+    def track(self, objects):
+        for obj in objects:
+            if self.kind == 'posts':
+                self.authors.add(obj.author_id)
+                self.counted_users.add(obj.author_id)
+                if obj.group_id is not None:
+                    self.group_ids.add(obj.group_id)
+            elif self.kind == 'comments':
+                self.post_ids.add(obj.post_id)
+            else:
+                self.authors.add(obj.author_id)
+                self.counted_users.update((obj.user_id, obj.author_id))
+
+    def chunks(self, ids):
+        ids = sorted(ids)
+        for start in range(0, len(ids), self.batch_size):
+            yield ids[start:start + self.batch_size]
+
+    def finish(self):
+        """Пересчитывает то, что при обычном сохранении делают сигналы."""
+        with transaction.atomic():
+            for post_ids in self.chunks(self.post_ids):
+                Post.objects.filter(pk__in=post_ids).recount_comments()
+            for user_ids in self.chunks(self.counted_users):
+                UserStats.objects.recount(User.objects.filter(pk__in=user_ids))
+            if self.kind == 'follows':
+                for author_id in self.authors:
+                    pause_fan_out(author_id)
+            if self.kind != 'comments':
+                self.backfill_timelines()
+            if self.kind == 'posts' and search.is_available():
+                for author_ids in self.chunks(self.authors):
+                    search.index_posts(
+                        Post.objects.filter(author_id__in=author_ids)
+                    )
+        self.purge_cache()
+
+    def purge_cache(self):
+        """Сбрасывает счетчики и карточки затронутых записей и кэш страниц.
+
+        Ключи лент подписок меняются вместе с версией автора записи или с
+        набором авторов подписчика, поэтому отдельно не удаляются.
+        """
+        if self.kind == 'posts' and self.imported:
+            keys = [count_cache_key('index')]
+            keys.extend(count_cache_key('author', pk) for pk in self.authors)
+            keys.extend(count_cache_key('group', pk) for pk in self.group_ids)
+            cache.delete_many(keys)
+            for author_id in self.authors:
+                bump_author_version(author_id)
+        for post_ids in self.chunks(self.post_ids):
+            invalidate_post_cards(
+                Post.objects.filter(pk__in=post_ids).values_list(
+                    'pk', 'updated'
+                )
+            )
+        if self.imported:
+            purge_page_cache()
+
+    def backfill_timelines(self):
+        for author_ids in self.chunks(self.authors):
+            follows = Follow.objects.filter(
+                author_id__in=author_ids
+            ).exclude(
+                author__stats__followers_count__gt=fan_out_limit()
+            ).values_list('user_id', 'author_id')
+            for user_id, author_id in follows.iterator():
+                TimelineEntry.objects.backfill(user_id, author_id)
@@ -0,0 +1,133 @@
+import tempfile
+import threading
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadhandler import (SkipFile,
+                                             TemporaryFileUploadHandler)
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+
+REENCODE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+
+_reencode_slots = None
+
+
+def get_reencode_slots():
+    global _reencode_slots
+    if _reencode_slots is None:
+        _reencode_slots = threading.BoundedSemaphore(
+            settings.POSTS_UPLOAD_REENCODE_CONCURRENCY
+        )
+    return _reencode_slots
+
+
+def check_size(size):
+    if size > settings.POSTS_UPLOAD_MAX_BYTES:
+        return 'Файл слишком большой, максимальный размер — {}'.format(
+            filesizeformat(settings.POSTS_UPLOAD_MAX_BYTES)
+        )
+    return None
+
+
+def check_dimensions(width, height):
+    if width * height > settings.POSTS_UPLOAD_MAX_PIXELS:
+        return 'Изображение слишком большое: {}×{} пикселей'.format(
+            width, height
+        )
+    return None
+
+
+def read_dimensions(file_obj):
+    """Читает размеры изображения из заголовка, не декодируя его."""
+    file_obj.seek(0)
+    try:
+        with Image.open(file_obj) as image:
+            return image.size
+    except Exception:
+        return None
+    finally:
+        file_obj.seek(0)
+
+
+def get_rejected_uploads(request):
+    """Причины отказа для полей, файлы которых отбросил обработчик."""
+    request.FILES  # загрузки разбираются при первом обращении
+    return getattr(request, 'rejected_uploads', {})
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузки сразу во временный файл и проверяет лимиты по ходу.
+
+    Как только файл превышает POSTS_UPLOAD_MAX_BYTES, загрузка пропускается
+    через SkipFile, а оставшиеся данные отбрасываются. Размеры изображения
+    проверяются по заголовку до того, как форма начнет его декодировать.
+    Отклоненного файла нет в request.FILES, причина остается в
+    request.rejected_uploads.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.reject(check_size(self.content_length or 0))
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        self.reject(check_size(self.received))
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        dimensions = read_dimensions(self.file)
+        error = dimensions and check_dimensions(*dimensions)
+        if error is None:
+            return super().file_complete(file_size)
+        self.file.close()
+        self.record(error)
+        return None
+
+    def reject(self, error):
+        if error is not None:
+            self.record(error)
+            raise SkipFile(error)
+
+    def record(self, error):
+        if self.request is None:
+            return
+        if not hasattr(self.request, 'rejected_uploads'):
+            self.request.rejected_uploads = {}
+        self.request.rejected_uploads[self.field_name] = error
+
+
+def sanitize_image(upload):
+    """Перекодирует изображение без метаданных EXIF.
+
+    Одновременно декодируется не больше POSTS_UPLOAD_REENCODE_CONCURRENCY
+    изображений; результат больше FILE_UPLOAD_MAX_MEMORY_SIZE пишется
+    во временный файл, а не держится в памяти.
+    """
+    with get_reencode_slots():
+        upload.seek(0)
+        with Image.open(upload) as image:
+            image_format = image.format
+            if image_format not in REENCODE_OPTIONS:
+                upload.seek(0)
+                return File(upload.file, name=upload.name)
+            icc_profile = image.info.get('icc_profile')
+            image = ImageOps.exif_transpose(image)
+            result = File(
+                tempfile.SpooledTemporaryFile(
+                    max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+                ),
+                name=upload.name
+            )
+            options = dict(REENCODE_OPTIONS[image_format])
+            if icc_profile:
+                options['icc_profile'] = icc_profile
+            image.save(result, image_format, **options)
+    result.seek(0)
+    return result
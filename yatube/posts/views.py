@@ -1,39 +1,112 @@
+import hashlib
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import redirect, render, get_object_or_404
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import urlencode
 
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post
+from .models import (Comment, Follow, Group, Post, UserStats,
+                     followed_authors)
+from .paginators import (COMMENTS_PAGE_SIZE, PAGE_SIZE, CommentPaginator,
+                         count_cache_key, follow_count_key, paginate)
+from .search import search_posts
+from .thumbnails import schedule_thumbnail
+from .transfer import CONTENT_TYPES, FIELDS, FORMATS, export_rows, serialize
+from .uploads import get_rejected_uploads
 
 
 User = get_user_model()
 
 
+def get_etag(request, posts, *state):
+    """ETag страницы по версиям записей без рендеринга.
+
+    Last-Modified не отдается: страница зависит и от подписок, счетчиков и
+    текста группы, у которых нет времени изменения.
+    """
+    versions = [(post.pk, post.updated.timestamp()) for post in posts]
+    return quote_etag(hashlib.md5(
+        repr((request.user.pk, state, versions)).encode()
+    ).hexdigest())
+
+
+def conditional_response(request, etag):
+    return get_conditional_response(request, etag)
+
+
+def render_conditional(request, template, context, etag):
+    response = conditional_response(request, etag)
+    if response is not None:
+        return response
+    return render_with_etag(request, template, context, etag)
+
+
+def render_with_etag(request, template, context, etag):
+    """Рендерит страницу с ETag без повторной проверки."""
+    response = render(request, template, context)
+    response['ETag'] = etag
+    return response
+
+
+def get_page_state(page):
+    # Страница по курсору не показывает число записей, и COUNT для нее
+    # не нужен: хватает признаков соседних страниц.
+    if getattr(page.paginator, 'is_cursor', False):
+        return page.cursor, page.has_previous(), page.has_next()
+    return page.number, page.paginator.count
+
+
+def get_stats_state(user):
+    stats = UserStats.objects.for_user(user)
+    return (
+        stats.posts_count, stats.followers_count, stats.following_count,
+        user.first_name, user.last_name
+    )
+
+
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'index.html', {'page': page})
+    post_list = Post.objects.for_feed()
+    page = paginate(
+        request, post_list, 'index', count_cache_key('index'),
+        approximate=getattr(settings, 'POSTS_APPROXIMATE_COUNT', False)
+    )
+    return render_conditional(
+        request, 'index.html', {'page': page},
+        get_etag(request, page, get_page_state(page))
+    )
 
 
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'group.html', {'group': group, 'page': page})
+    post_list = group.posts.for_feed()
+    page = paginate(
+        request, post_list, 'group_posts', count_cache_key('group', group.pk)
+    )
+    return render_conditional(
+        request, 'group.html', {'group': group, 'page': page},
+        get_etag(
+            request, page, get_page_state(page),
+            group.title, group.description
+        )
+    )
 
 
 @login_required
 def new_post(request):
-    form = PostForm(request.POST or None, files=request.FILES or None)
+    form = PostForm(
+        request.POST or None, files=request.FILES or None,
+        rejected_uploads=get_rejected_uploads(request)
+    )
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        schedule_thumbnail(post)
         return redirect('posts:index')
     return render(
         request,
@@ -44,42 +117,70 @@ def new_post(request):
 
 def profile(request, username):
     user = get_object_or_404(
-        User.objects.prefetch_related('posts'), username=username
+        User.objects.select_related('stats'), username=username
+    )
+    post_list = user.posts.for_feed()
+    page = paginate(
+        request, post_list, 'profile', count_cache_key('author', user.pk)
     )
-    post_list = user.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
     following = False
     if request.user.is_authenticated and Follow.objects.filter(
         author=user, user=request.user
     ).exists():
         following = True
-    return render(
+    return render_conditional(
         request, 'profile.html',
-        {'page': page, 'author': user, 'following': following}
+        {'page': page, 'author': user, 'following': following},
+        get_etag(
+            request, page, get_page_state(page), following,
+            get_stats_state(user)
+        )
     )
 
 
 def post_view(request, username, post_id):
     post = get_object_or_404(
-        Post.objects.select_related('author'),
+        Post.objects.for_feed().select_related('author__stats')
+        .with_following(request.user),
         author__username=username, id=post_id
     )
-    posts_count = Post.objects.filter(author__username=username).count()
-    form = CommentForm()
-    comments = Comment.objects.filter(post=post_id)
-    following = False
-    if request.user.is_authenticated and Follow.objects.filter(
-        author=post.author, user=request.user
-    ).exists():
-        following = True
-    return render(
+    following = post.is_following
+    etag = get_etag(
+        request, [post], following, get_stats_state(post.author)
+    )
+    response = conditional_response(request, etag)
+    if response is not None:
+        return response
+    comments, comments_page = get_comment_paginator(post).first_page(
+        post.comment_count
+    )
+    return render_with_etag(
         request, 'post.html', {
-            'author': post.author, 'post': post, 'posts_count': posts_count,
-            'form': form, 'comments': comments, 'following': following
-        }
+            'author': post.author, 'post': post,
+            'posts_count': post.author.stats.posts_count,
+            'form': CommentForm(), 'comments': comments,
+            'comments_page': comments_page, 'following': following
+        },
+        etag
+    )
+
+
+def get_comment_paginator(post):
+    return CommentPaginator(
+        Comment.objects.filter(post=post).select_related('author'),
+        COMMENTS_PAGE_SIZE
+    )
+
+
+def post_comments(request, username, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author'),
+        author__username=username, id=post_id
     )
+    page = get_comment_paginator(post).get_page(request.GET.get('cursor'))
+    return render(request, 'includes/comment_items.html', {
+        'post': post, 'comments': page, 'comments_page': page
+    })
 
 
 @login_required
@@ -89,9 +190,16 @@ def post_edit(request, username, post_id):
         return redirect('posts:post', username, post_id)
     post = get_object_or_404(Post, id=post_id, author=author)
     form = PostForm(
-        request.POST or None, files=request.FILES or None, instance=post)
+        request.POST or None, files=request.FILES or None, instance=post,
+        rejected_uploads=get_rejected_uploads(request)
+    )
     if form.is_valid():
-        form.save()
+        post = form.save(commit=False)
+        if 'image' in form.changed_data:
+            post.thumbnail = post.image_variants = ''
+        post.save()
+        if 'image' in form.changed_data:
+            schedule_thumbnail(post)
         return redirect('posts:post', username, post_id)
     return render(request, 'new_post.html', {
         'form': form, 'is_new': False, 'post': post}
@@ -112,24 +220,35 @@ def add_comment(request, username, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(
+    authors = followed_authors(request.user)
+    post_list = Post.objects.for_follower(request.user, authors).for_feed()
+    page = paginate(
+        request, post_list, 'follow_index', follow_count_key(
+            request.user, [author_id for author_id, _, _ in authors]
+        )
+    )
+    return render_conditional(
         request, 'follow.html',
-        {'page': page, 'follow': True}
+        {'page': page, 'follow': True},
+        get_etag(request, page, get_page_state(page))
     )
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(search_posts(query), PAGE_SIZE)
+    page = paginator.get_page(request.GET.get('page'))
+    return render(request, 'search.html', {
+        'page': page, 'query': query,
+        'page_query': urlencode({'q': query}) + '&' if query else ''
+    })
+
+
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if not Follow.objects.filter(
-        user=request.user,
-        author=author
-    ).exists() and request.user != author:
-        Follow.objects.create(user=request.user, author=author)
+    if request.user != author:
+        Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username)
 
 
@@ -143,6 +262,25 @@ def profile_unfollow(request, username):
     return redirect('posts:profile', username)
 
 
+@login_required
+def profile_export(request, username):
+    """Выгрузка своих записей, комментариев или подписок потоком строк."""
+    if request.user.username != username:
+        return redirect('posts:profile', username)
+    kind = request.GET.get('kind', 'posts')
+    file_format = request.GET.get('format', FORMATS[0])
+    if kind not in FIELDS or file_format not in FORMATS:
+        raise Http404
+    response = StreamingHttpResponse(
+        serialize(file_format, kind, export_rows(kind, user=request.user)),
+        content_type=CONTENT_TYPES[file_format]
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{username}-{kind}.{file_format}"'
+    )
+    return response
+
+
 def page_not_found(request, exception):
     return render(
         request,
@@ -0,0 +1,325 @@
+import pickle
+import socket
+import threading
+from urllib.parse import urlparse
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.module_loading import import_string
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisCache(BaseCache):
+    """Кэш на сервере с протоколом Redis (RESP), без сторонних клиентов.
+
+    LOCATION задается как redis://host:port/db или host:port.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        url = urlparse(server if '://' in server else f'redis://{server}')
+        self.host = url.hostname or '127.0.0.1'
+        self.port = url.port or 6379
+        self.db = int(url.path.strip('/') or 0)
+        self.socket_timeout = params.get('OPTIONS', {}).get(
+            'SOCKET_TIMEOUT', 1
+        )
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection(
+            (self.host, self.port), timeout=self.socket_timeout
+        )
+        self._local.sock = sock
+        self._local.reader = sock.makefile('rb')
+        if self.db:
+            self._execute([('SELECT', self.db)])
+
+    def _disconnect(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            self._local.reader.close()
+            sock.close()
+        self._local.sock = None
+
+    @staticmethod
+    def _encode(args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError('Соединение с кэшем закрыто')
+        kind, body = line[:1], line[1:-2]
+        if kind == b'+':
+            return body.decode()
+        if kind == b'-':
+            return RedisError(body.decode())
+        if kind == b':':
+            return int(body)
+        if kind == b'$':
+            length = int(body)
+            if length == -1:
+                return None
+            return self._local.reader.read(length + 2)[:-2]
+        if kind == b'*':
+            length = int(body)
+            if length == -1:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RedisError(f'Неизвестный ответ: {line!r}')
+
+    def _execute(self, commands):
+        # Ответы читаются все до единого, даже если среди них есть ошибки,
+        # иначе следующая команда в этом потоке получит чужой ответ.
+        self._local.sock.sendall(
+            b''.join(self._encode(args) for args in commands)
+        )
+        replies = [self._read_reply() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    def _pipeline(self, *commands):
+        for attempt in range(2):
+            if getattr(self._local, 'sock', None) is None:
+                self._connect()
+            try:
+                return self._execute(commands)
+            except RedisError:
+                raise
+            except (ConnectionError, socket.timeout, OSError):
+                self._disconnect()
+                if attempt:
+                    raise
+            except BaseException:
+                self._disconnect()
+                raise
+
+    def _command(self, *args):
+        return self._pipeline(args)[0]
+
+    def _expiry_args(self, timeout):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT \
+            else timeout
+        if timeout is None:
+            return ()
+        return ('PX', max(int(timeout * 1000), 1))
+
+    @staticmethod
+    def _dumps(value):
+        # Целые числа хранятся как есть, чтобы работал атомарный INCRBY.
+        if type(value) is int:
+            return str(value).encode()
+        return pickle.dumps(value)
+
+    @staticmethod
+    def _loads(value):
+        try:
+            return int(value)
+        except ValueError:
+            return pickle.loads(value)
+
+    def _set_command(self, key, value, timeout, version):
+        return (
+            'SET', self.make_key(key, version), self._dumps(value),
+            *self._expiry_args(timeout)
+        )
+
+    @staticmethod
+    def _is_expired(timeout):
+        return timeout is not None and timeout is not DEFAULT_TIMEOUT \
+            and timeout <= 0
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.validate_key(key)
+        if self._is_expired(timeout):
+            return False
+        command = self._set_command(key, value, timeout, version)
+        return self._command(*command, 'NX') == 'OK'
+
+    def get(self, key, default=None, version=None):
+        self.validate_key(key)
+        value = self._command('GET', self.make_key(key, version))
+        return default if value is None else self._loads(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.validate_key(key)
+        if self._is_expired(timeout):
+            self.delete(key, version)
+            return
+        self._command(*self._set_command(key, value, timeout, version))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version)
+        expiry = self._expiry_args(timeout)
+        if not expiry:
+            return self._pipeline(('PERSIST', key), ('EXISTS', key))[1] == 1
+        return self._command('PEXPIRE', key, expiry[1]) == 1
+
+    def delete(self, key, version=None):
+        self.validate_key(key)
+        self._command('DEL', self.make_key(key, version))
+
+    def incr(self, key, delta=1, version=None):
+        self.validate_key(key)
+        key = self.make_key(key, version)
+        exists, value = self._pipeline(
+            ('MULTI',), ('EXISTS', key), ('INCRBY', key, delta), ('EXEC',)
+        )[-1]
+        if isinstance(value, RedisError):
+            raise value
+        if not exists:
+            self._command('DEL', key)
+            raise ValueError(f"Key '{key}' not found")
+        return value
+
+    def has_key(self, key, version=None):
+        self.validate_key(key)
+        return self._command('EXISTS', self.make_key(key, version)) == 1
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        for key in keys:
+            self.validate_key(key)
+        values = self._command(
+            'MGET', *(self.make_key(key, version) for key in keys)
+        )
+        return {
+            key: self._loads(value)
+            for key, value in zip(keys, values) if value is not None
+        }
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if not data:
+            return []
+        if self._is_expired(timeout):
+            self.delete_many(data, version)
+            return []
+        for key in data:
+            self.validate_key(key)
+        self._pipeline(*(
+            self._set_command(key, value, timeout, version)
+            for key, value in data.items()
+        ))
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        if keys:
+            self._command(
+                'DEL', *(self.make_key(key, version) for key in keys)
+            )
+
+    def clear(self):
+        self._command('FLUSHDB')
+
+    def close(self, **kwargs):
+        # Соединения остаются открытыми между запросами в пределах потока.
+        pass
+
+
+class TieredCache(BaseCache):
+    """Общий кэш (OPTIONS['SHARED']) с локальным LRU-кэшем процесса.
+
+    Локальный уровень хранит значения не дольше L1_TIMEOUT секунд, поэтому
+    удаление ключа в другом процессе становится видно с этой задержкой.
+    """
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        shared = options.pop('SHARED')
+        self.l1_timeout = options.pop('L1_TIMEOUT', 5)
+        super().__init__(dict(params, OPTIONS=options))
+        self.local = LocMemCache(
+            f'tiered-{location or id(self)}',
+            {'TIMEOUT': self.l1_timeout, 'OPTIONS': options}
+        )
+        self.shared = import_string(shared['BACKEND'])(
+            shared.get('LOCATION', ''), shared
+        )
+
+    def _local_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self.l1_timeout
+        return min(timeout, self.l1_timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self.local.set(key, value, self._local_timeout(timeout), version)
+        return added
+
+    def get(self, key, default=None, version=None):
+        sentinel = object()
+        value = self.local.get(key, sentinel, version)
+        if value is not sentinel:
+            return value
+        value = self.shared.get(key, sentinel, version)
+        if value is sentinel:
+            return default
+        self.local.set(key, value, self.l1_timeout, version)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self.local.set(key, value, self._local_timeout(timeout), version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.touch(key, self._local_timeout(timeout), version)
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.local.delete(key, version)
+        self.shared.delete(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        # Локальная копия счетчика может быть устаревшей, поэтому значение
+        # меняется только в общем кэше.
+        self.local.delete(key, version)
+        return self.shared.incr(key, delta, version)
+
+    def has_key(self, key, version=None):
+        return self.local.has_key(key, version) or self.shared.has_key(
+            key, version
+        )
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self.local.get_many(keys, version)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            shared = self.shared.get_many(missing, version)
+            self.local.set_many(shared, self.l1_timeout, version)
+            found.update(shared)
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        self.local.set_many(data, self._local_timeout(timeout), version)
+        return failed
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.local.delete_many(keys, version)
+        self.shared.delete_many(keys, version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
@@ -0,0 +1,196 @@
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified)
+from django.middleware.gzip import GZipMiddleware
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript',
+                      'application/x-ndjson', 'image/svg+xml')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+HASHED_NAME_RE = re.compile(r'^(.+)\.[0-9a-f]{12}(\.[^./]+)?$')
+ENCODINGS = (('br', 'br'), ('gzip', 'gz'))
+
+
+class RangeFile:
+    """Файл, из которого читается не больше length байт от текущей позиции.
+
+    fileno() остается доступен, поэтому WSGI-сервер с поддержкой sendfile
+    (например, gunicorn) отдает диапазон без копирования через Python.
+    """
+
+    def __init__(self, file_obj, start, length):
+        self.file_obj = file_obj
+        self.remaining = length
+        file_obj.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file_obj.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file_obj.fileno()
+
+    def close(self):
+        self.file_obj.close()
+
+
+def parse_range(header, size):
+    match = RANGE_RE.match(header.strip())
+    if match is None or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    if start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def is_hashed(path):
+    match = HASHED_NAME_RE.match(path)
+    if match is None:
+        return False
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+    return hashed_files.get(''.join(match.groups(''))) == path
+
+
+def resolve(root, path):
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(root, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+    return fullpath
+
+
+def file_response(request, fullpath, content_type=None, encoding=None):
+    """Отдает файл с поддержкой If-Modified-Since и запросов Range."""
+    stat = os.stat(fullpath)
+    last_modified = http_date(stat.st_mtime)
+    if not was_modified_since(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'),
+        stat.st_mtime, stat.st_size
+    ):
+        return HttpResponseNotModified()
+    if content_type is None:
+        content_type = mimetypes.guess_type(fullpath)[0]
+    content_type = content_type or 'application/octet-stream'
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if 'HTTP_RANGE' in request.META and if_range in (None, last_modified):
+        try:
+            byte_range = parse_range(request.META['HTTP_RANGE'], stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+    file_obj = open(fullpath, 'rb')
+    if byte_range is None:
+        response = FileResponse(file_obj)
+        response['Content-Length'] = stat.st_size
+    else:
+        start, end = byte_range
+        response = FileResponse(
+            RangeFile(file_obj, start, end - start + 1), status=206
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = end - start + 1
+    response['Content-Type'] = content_type
+    response['Last-Modified'] = last_modified
+    response['Accept-Ranges'] = 'bytes'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
+
+
+@require_safe
+def serve_static(request, path):
+    """Отдает собранную статику, предпочитая сжатые копии .br и .gz.
+
+    Файлы с хешем в имени кэшируются браузером на STATIC_MAX_AGE секунд,
+    остальные перепроверяются при каждом обращении.
+    """
+    fullpath = resolve(settings.STATIC_ROOT, path)
+    content_type = mimetypes.guess_type(fullpath)[0]
+    accepted = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    response = None
+    if 'HTTP_RANGE' not in request.META:
+        for encoding, extension in ENCODINGS:
+            if encoding in accepted and os.path.isfile(
+                f'{fullpath}.{extension}'
+            ):
+                response = file_response(
+                    request, f'{fullpath}.{extension}',
+                    content_type, encoding
+                )
+                break
+    if response is None:
+        response = file_response(request, fullpath, content_type)
+    response['Vary'] = 'Accept-Encoding'
+    if is_hashed(path):
+        response['Cache-Control'] = (
+            f'public, max-age={settings.STATIC_MAX_AGE}, immutable'
+        )
+    else:
+        response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Отдает загруженные файлы или поручает это фронтенд-серверу.
+
+    При MEDIA_ACCEL_REDIRECT ответ содержит X-Accel-Redirect для nginx,
+    при MEDIA_SENDFILE_HEADER — заголовок X-Sendfile с путем к файлу.
+    """
+    fullpath = resolve(settings.MEDIA_ROOT, path)
+    if settings.MEDIA_ACCEL_REDIRECT or settings.MEDIA_SENDFILE_HEADER:
+        response = HttpResponse(content_type=(
+            mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+        ))
+        if settings.MEDIA_ACCEL_REDIRECT:
+            response['X-Accel-Redirect'] = posixpath.join(
+                settings.MEDIA_ACCEL_REDIRECT,
+                posixpath.normpath(path).lstrip('/')
+            )
+        else:
+            response[settings.MEDIA_SENDFILE_HEADER] = fullpath
+        return response
+    response = file_response(request, fullpath)
+    response['Cache-Control'] = f'public, max-age={settings.MEDIA_MAX_AGE}'
+    return response
+
+
+class TextGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware, который не трогает файлы и нетекстовые ответы.
+
+    Сжатие FileResponse из serve_media и serve_static ломает ответы 206
+    (Content-Range считается по исходному файлу) и отключает sendfile.
+    """
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '')
+        if (isinstance(response, FileResponse)
+                or response.status_code == 206
+                or not content_type.startswith(COMPRESSIBLE_TYPES)):
+            return response
+        return super().process_response(request, response)
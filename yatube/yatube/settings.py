@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -26,8 +27,17 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv('SECRET_KEY')
 
+# 'dev' runs with DEBUG and the debug toolbar. 'prod' drops both, caches
+# compiled templates, keeps database connections open between requests,
+# keeps sessions in the cache and gzips responses.
+SETTINGS_PROFILE = os.getenv('DJANGO_PROFILE', 'dev')
+if SETTINGS_PROFILE not in ('dev', 'prod'):
+    raise ImproperlyConfigured(
+        f'Unknown DJANGO_PROFILE {SETTINGS_PROFILE!r}, use dev or prod'
+    )
+
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = SETTINGS_PROFILE == 'dev'
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -42,7 +52,7 @@ ALLOWED_HOSTS = [
 
 INSTALLED_APPS = [
     'users',
-    'posts',
+    'posts.apps.PostsConfig',
     'about',
     'sorl.thumbnail',
     'debug_toolbar',
@@ -63,6 +73,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -98,6 +109,33 @@ DATABASES = {
     }
 }
 
+# With the cached loader (prod) every template is parsed once when the WSGI
+# application starts, see `manage.py compile_templates`.
+TEMPLATES_PRELOAD = SETTINGS_PROFILE == 'prod'
+
+if SETTINGS_PROFILE == 'prod':
+    INSTALLED_APPS.remove('debug_toolbar')
+    MIDDLEWARE.remove('debug_toolbar.middleware.DebugToolbarMiddleware')
+    # Files from serve_media/serve_static are left uncompressed: gzip would
+    # break Range responses and rule out sendfile.
+    MIDDLEWARE.insert(0, 'yatube.serving.TextGZipMiddleware')
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['context_processors'].remove(
+        'django.template.context_processors.debug'
+    )
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+    DATABASES['default']['CONN_MAX_AGE'] = int(
+        os.getenv('DB_CONN_MAX_AGE', 60)
+    )
+    SESSION_ENGINE = os.getenv(
+        'SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db'
+    )
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -151,12 +189,108 @@ LOGIN_REDIRECT_URL = "posts:index"
 EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Cache: 'locmem' keeps a cache per process, 'file' and 'redis' share one
+# cache between workers behind a short-lived in-process LRU level.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+
+SHARED_CACHES = {
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+        ),
+    },
+    'redis': {
+        'BACKEND': 'yatube.cache.RedisCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', 'redis://127.0.0.1:6379/0'),
+    },
+}
+
+if CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'yatube.cache.TieredCache',
+            'OPTIONS': {
+                'SHARED': SHARED_CACHES[CACHE_BACKEND],
+                'L1_TIMEOUT': int(os.getenv('CACHE_L1_TIMEOUT', 5)),
+                'MAX_ENTRIES': 1000,
+            },
+        }
     }
+
+# Posts pagination: 'offset' (page numbers) or 'cursor' (keyset on
+# pub_date, id) per feed view. Views not listed use 'offset'.
+POSTS_PAGINATION = {
+    'index': 'offset',
+    'group_posts': 'offset',
+    'profile': 'offset',
+    'follow_index': 'offset',
 }
 
+# Feed counts are cached and invalidated by signals. The approximate mode
+# estimates the size of the global feed from the largest primary key.
+POSTS_COUNT_CACHE_TIMEOUT = 60 * 60
+POSTS_APPROXIMATE_COUNT = False
+
+# Authors with more followers than this are not fanned out to timelines;
+# their posts are merged into the follow feed at read time instead.
+POSTS_FANOUT_FOLLOWER_LIMIT = 10000
+# When an author drops back to the limit, posts published above it are
+# added to the followers' timelines by this many background threads
+# (0 does it inside the request); backfill_timelines retries leftovers.
+POSTS_TIMELINE_WORKERS = int(os.getenv('POSTS_TIMELINE_WORKERS', 1))
+
+# Rendered post cards are cached per post version and viewer.
+POSTS_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Full-page cache for anonymous readers. Pages are fresh for
+# POSTS_PAGE_CACHE_TIMEOUT seconds and served stale for another
+# POSTS_PAGE_CACHE_GRACE seconds while a single request re-renders them.
+POSTS_PAGE_CACHE_TIMEOUT = 60
+POSTS_PAGE_CACHE_GRACE = 60
+POSTS_PAGE_CACHE_VIEWS = (
+    'posts:index', 'posts:group', 'posts:profile', 'posts:post',
+)
+
+# Thumbnails are generated after upload by a pool of background threads;
+# 0 generates them synchronously inside the request.
+POSTS_THUMBNAIL_WORKERS = int(os.getenv('POSTS_THUMBNAIL_WORKERS', 2))
+
+# Responsive image variants stored under MEDIA_ROOT/variants/<image name>/
+# with a manifest.json. Formats the installed Pillow cannot write are skipped.
+POSTS_IMAGE_VARIANT_WIDTHS = (320, 640, 960, 1280)
+POSTS_IMAGE_VARIANT_FORMATS = ('avif', 'webp', 'jpeg')
+
+# Uploads are streamed to temporary files and rejected as soon as they
+# exceed POSTS_UPLOAD_MAX_BYTES or, judging by the image header,
+# POSTS_UPLOAD_MAX_PIXELS. Accepted images are re-encoded without EXIF
+# metadata, at most POSTS_UPLOAD_REENCODE_CONCURRENCY at a time.
+FILE_UPLOAD_HANDLERS = ['posts.uploads.BoundedUploadHandler']
+POSTS_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+POSTS_UPLOAD_MAX_PIXELS = 40 * 1000 * 1000
+POSTS_UPLOAD_REENCODE_CONCURRENCY = 2
+
+# Outside DEBUG, collectstatic stores hashed file names together with .gz
+# (and .br when the brotli package is installed) copies; hashed files are
+# served with far-future cache headers. Media is handed off to the front-end
+# server via X-Accel-Redirect (MEDIA_ACCEL_REDIRECT, an nginx internal
+# location) or MEDIA_SENDFILE_HEADER (e.g. X-Sendfile), otherwise it is
+# streamed by FileResponse with Range support.
+if not DEBUG:
+    STATICFILES_STORAGE = (
+        'yatube.storage.CompressedManifestStaticFilesStorage'
+    )
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
+MEDIA_MAX_AGE = 60 * 60 * 24
+MEDIA_ACCEL_REDIRECT = os.getenv('MEDIA_ACCEL_REDIRECT', '')
+MEDIA_SENDFILE_HEADER = os.getenv('MEDIA_SENDFILE_HEADER', '')
+
 INTERNAL_IPS = [
     "127.0.0.1",
 ]
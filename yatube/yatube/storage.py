@@ -0,0 +1,63 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.json', '.map', '.svg', '.txt', '.xml', '.html',
+    '.ico', '.eot', '.ttf', '.otf',
+)
+MIN_COMPRESS_SIZE = 256
+
+
+def compressors():
+    yield 'gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield 'br', lambda data: brotli.compress(data)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешем в имени и заранее сжатыми копиями .gz и .br.
+
+    Сжатая копия сохраняется, только если она меньше исходного файла.
+    Отсутствующие в манифесте файлы отдаются под исходным именем.
+    """
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if isinstance(hashed_name, str):
+                names.update((name, hashed_name))
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in sorted(names):
+            if self.is_compressible(name):
+                self.compress(name)
+
+    @staticmethod
+    def is_compressible(name):
+        return os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+    def compress(self, name):
+        with self.open(name) as source:
+            data = source.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        for extension, compress in compressors():
+            compressed = compress(data)
+            target = f'{name}.{extension}'
+            if self.exists(target):
+                self.delete(target)
+            if len(compressed) < len(data):
+                self._save(target, ContentFile(compressed))
@@ -0,0 +1,154 @@
+import socketserver
+import threading
+import time
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def write(self, reply):
+        if reply is None:
+            self.wfile.write(b'$-1\r\n')
+        elif isinstance(reply, ValueError):
+            self.wfile.write(b'-ERR %s\r\n' % str(reply).encode())
+        elif isinstance(reply, bool):
+            self.wfile.write(b':%d\r\n' % reply)
+        elif isinstance(reply, int):
+            self.wfile.write(b':%d\r\n' % reply)
+        elif isinstance(reply, str):
+            self.wfile.write(b'+%s\r\n' % reply.encode())
+        elif isinstance(reply, list):
+            self.wfile.write(b'*%d\r\n' % len(reply))
+            for item in reply:
+                self.write(item)
+        else:
+            self.wfile.write(b'$%d\r\n%s\r\n' % (len(reply), reply))
+
+    def run(self, name, args):
+        try:
+            return getattr(self.server, f'do_{name.lower()}')(*args)
+        except ValueError as error:
+            return error
+
+    def handle(self):
+        queued = None
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            name = args[0].decode().upper()
+            if name == 'MULTI':
+                queued = []
+                self.write('OK')
+            elif name == 'EXEC':
+                with self.server.lock:
+                    self.write([self.run(*command) for command in queued])
+                queued = None
+            elif queued is not None:
+                queued.append((name, args[1:]))
+                self.write('QUEUED')
+            else:
+                with self.server.lock:
+                    self.write(self.run(name, args[1:]))
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    """Минимальный сервер с протоколом Redis для тестов кэша."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeRedisHandler)
+        self.lock = threading.Lock()
+        self.data = {}
+        self.commands = []
+
+    @property
+    def location(self):
+        return 'redis://{}:{}/0'.format(*self.server_address)
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+    def _get(self, key):
+        value, expires = self.data.get(key, (None, None))
+        if expires is not None and expires <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def _log(self, name):
+        self.commands.append(name)
+
+    def do_ping(self):
+        return 'PONG'
+
+    def do_select(self, db):
+        return 'OK'
+
+    def do_get(self, key):
+        self._log('GET')
+        return self._get(key)
+
+    def do_mget(self, *keys):
+        self._log('MGET')
+        return [self._get(key) for key in keys]
+
+    def do_set(self, key, value, *options):
+        self._log('SET')
+        options = [option.upper() for option in options]
+        if b'NX' in options and self._get(key) is not None:
+            return None
+        expires = None
+        if b'PX' in options:
+            milliseconds = int(options[options.index(b'PX') + 1])
+            expires = time.monotonic() + milliseconds / 1000
+        self.data[key] = (value, expires)
+        return 'OK'
+
+    def do_incrby(self, key, delta):
+        self._log('INCRBY')
+        value = self._get(key) or b'0'
+        if not value.lstrip(b'-').isdigit():
+            raise ValueError('value is not an integer or out of range')
+        value = str(int(value) + int(delta)).encode()
+        self.data[key] = (value, self.data.get(key, (None, None))[1])
+        return int(value)
+
+    def do_del(self, *keys):
+        self._log('DEL')
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def do_exists(self, key):
+        return self._get(key) is not None
+
+    def do_pexpire(self, key, milliseconds):
+        value = self._get(key)
+        if value is None:
+            return 0
+        self.data[key] = (value, time.monotonic() + int(milliseconds) / 1000)
+        return 1
+
+    def do_persist(self, key):
+        value = self._get(key)
+        if value is None:
+            return 0
+        self.data[key] = (value, None)
+        return 1
+
+    def do_flushdb(self):
+        self.data.clear()
+        return 'OK'
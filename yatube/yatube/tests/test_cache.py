@@ -0,0 +1,159 @@
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from posts.cache import page_cache_generation, purge_page_cache
+
+from ..cache import RedisCache, RedisError, TieredCache
+from .fake_redis import FakeRedisServer
+
+
+class RedisCacheTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeRedisServer().__enter__()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.__exit__()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.cache = RedisCache(
+            RedisCacheTest.server.location, {'KEY_PREFIX': 'test'}
+        )
+        self.cache.clear()
+
+    def test_set_get_delete(self):
+        """Значения сохраняются, читаются и удаляются"""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertTrue(self.cache.has_key('key'))
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('key', 'default'), 'default')
+
+    def test_add_and_incr(self):
+        """add не перезаписывает существующий ключ"""
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 5))
+        self.assertEqual(self.cache.incr('counter'), 2)
+
+    def test_incr_is_atomic(self):
+        """incr выполняется на сервере и не требует существующего значения"""
+        self.cache.set('counter', 3)
+        RedisCacheTest.server.commands.clear()
+        self.assertEqual(self.cache.incr('counter', 2), 5)
+        self.assertEqual(self.cache.decr('counter'), 4)
+        self.assertNotIn('GET', RedisCacheTest.server.commands)
+        self.assertEqual(self.cache.get('counter'), 4)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.assertIsNone(self.cache.get('missing'))
+
+    def test_error_reply_keeps_connection_in_sync(self):
+        """После ошибки в середине пакета ответы не смещаются"""
+        self.cache.set('text', 'value')
+        self.cache.set('number', 1)
+        with self.assertRaises(RedisError):
+            self.cache._pipeline(
+                ('INCRBY', self.cache.make_key('text'), 1),
+                ('GET', self.cache.make_key('number'))
+            )
+        self.assertEqual(self.cache.get('text'), 'value')
+        self.assertEqual(self.cache.get('number'), 1)
+
+    def test_many(self):
+        """Пакетные операции выполняются за одно обращение"""
+        self.cache.set_many({'a': 1, 'b': 2})
+        RedisCacheTest.server.commands.clear()
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2}
+        )
+        self.assertEqual(RedisCacheTest.server.commands, ['MGET'])
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b']), {})
+
+    def test_timeout(self):
+        """Значение удаляется по истечении срока хранения"""
+        self.cache.set('short', 'value', timeout=0.05)
+        self.cache.set('expired', 'value', timeout=0)
+        self.assertEqual(self.cache.get('short'), 'value')
+        self.assertIsNone(self.cache.get('expired'))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+
+    def test_reconnects_after_connection_loss(self):
+        """Клиент переподключается после разрыва соединения"""
+        self.cache.set('key', 'value')
+        self.cache._local.sock.close()
+        self.assertEqual(self.cache.get('key'), 'value')
+
+
+class TieredCacheTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeRedisServer().__enter__()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.__exit__()
+        super().tearDownClass()
+
+    def create_cache(self, name):
+        return TieredCache(name, {'OPTIONS': {
+            'L1_TIMEOUT': 60,
+            'SHARED': {
+                'BACKEND': 'yatube.cache.RedisCache',
+                'LOCATION': TieredCacheTest.server.location,
+            },
+        }})
+
+    def setUp(self):
+        self.first = self.create_cache('first')
+        self.second = self.create_cache('second')
+        self.first.clear()
+        self.second.clear()
+
+    def test_values_are_shared_between_processes(self):
+        """Значение, записанное одним процессом, видно другому"""
+        self.first.set('key', 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        self.assertEqual(self.second.get_many(['key']), {'key': 'value'})
+
+    def test_local_level_serves_repeated_reads(self):
+        """Повторное чтение не обращается к общему кэшу"""
+        self.first.set('key', 'value')
+        self.second.get('key')
+        TieredCacheTest.server.commands.clear()
+        self.assertEqual(self.second.get('key'), 'value')
+        self.assertEqual(self.second.get_many(['key']), {'key': 'value'})
+        self.assertEqual(TieredCacheTest.server.commands, [])
+
+    def test_delete_clears_both_levels(self):
+        """Удаление очищает локальный и общий уровни"""
+        self.first.set('key', 'value')
+        self.first.delete('key')
+        self.assertIsNone(self.first.get('key'))
+        self.assertIsNone(self.second.get('key'))
+
+    def test_incr_ignores_stale_local_copy(self):
+        """incr другого процесса не откатывает счетчик назад"""
+        self.first.set('counter', 1)
+        self.second.get('counter')
+        self.first.incr('counter')
+        self.first.incr('counter')
+        self.assertEqual(self.second.incr('counter'), 4)
+        self.assertEqual(self.first.get('counter'), 4)
+
+    def test_page_cache_generation_is_shared(self):
+        """Поколение кэша страниц читается из общего уровня"""
+        with mock.patch('posts.cache.cache', self.second):
+            generation = page_cache_generation()
+        with mock.patch('posts.cache.cache', self.first):
+            purge_page_cache()
+        with mock.patch('posts.cache.cache', self.second):
+            self.assertEqual(page_cache_generation(), generation + 1)
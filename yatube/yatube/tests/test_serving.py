@@ -0,0 +1,166 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils.module_loading import import_string
+
+from ..serving import serve_media, serve_static
+from .test_settings import load_settings
+
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+STATIC_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+STATIC_SOURCE = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    MEDIA_ACCEL_REDIRECT='',
+    MEDIA_SENDFILE_HEADER=''
+)
+class ServeMediaTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with open(os.path.join(MEDIA_ROOT, 'file.jpg'), 'wb') as file_obj:
+            file_obj.write(bytes(range(100)))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_full_response(self):
+        """Файл отдается целиком с заголовками кэширования"""
+        response = serve_media(self.factory.get('/media/file.jpg'), 'file.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            b''.join(response.streaming_content), bytes(range(100))
+        )
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('max-age', response['Cache-Control'])
+
+    def test_range_request(self):
+        """Запрос Range получает только нужную часть файла"""
+        for header, expected, content_range in (
+            ('bytes=10-19', bytes(range(10, 20)), 'bytes 10-19/100'),
+            ('bytes=95-', bytes(range(95, 100)), 'bytes 95-99/100'),
+            ('bytes=-3', bytes(range(97, 100)), 'bytes 97-99/100'),
+        ):
+            with self.subTest(header=header):
+                response = serve_media(
+                    self.factory.get('/media/file.jpg', HTTP_RANGE=header),
+                    'file.jpg'
+                )
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(
+                    b''.join(response.streaming_content), expected
+                )
+                self.assertEqual(
+                    int(response['Content-Length']), len(expected)
+                )
+
+    def test_unsatisfiable_range(self):
+        """Диапазон за пределами файла возвращает 416"""
+        response = serve_media(
+            self.factory.get('/media/file.jpg', HTTP_RANGE='bytes=200-'),
+            'file.jpg'
+        )
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_prod_gzip_keeps_range_response(self):
+        """Сжатие в профиле prod не трогает частичные ответы с файлами"""
+        middleware = import_string(load_settings('prod')['MIDDLEWARE'][0])(
+            lambda request: serve_media(request, 'file.jpg')
+        )
+        for header in ('bytes=10-19', None):
+            with self.subTest(header=header):
+                extra = {'HTTP_RANGE': header} if header else {}
+                response = middleware(self.factory.get(
+                    '/media/file.jpg', HTTP_ACCEPT_ENCODING='gzip', **extra
+                ))
+                self.assertNotIn('Content-Encoding', response)
+                self.assertEqual(
+                    len(b''.join(response.streaming_content)),
+                    int(response['Content-Length'])
+                )
+
+    @override_settings(MEDIA_ACCEL_REDIRECT='/protected-media/')
+    def test_accel_redirect(self):
+        """Отдача файла поручается nginx через X-Accel-Redirect"""
+        response = serve_media(self.factory.get('/media/file.jpg'), 'file.jpg')
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/file.jpg'
+        )
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_SENDFILE_HEADER='X-Sendfile')
+    def test_sendfile_header(self):
+        """Отдача файла поручается серверу через X-Sendfile"""
+        response = serve_media(self.factory.get('/media/file.jpg'), 'file.jpg')
+        self.assertEqual(
+            response['X-Sendfile'], os.path.join(MEDIA_ROOT, 'file.jpg')
+        )
+
+
+@override_settings(
+    STATIC_ROOT=STATIC_ROOT,
+    STATICFILES_DIRS=[STATIC_SOURCE],
+    STATICFILES_FINDERS=[
+        'django.contrib.staticfiles.finders.FileSystemFinder'
+    ],
+    STATICFILES_STORAGE='yatube.storage.CompressedManifestStaticFilesStorage'
+)
+class ServeStaticTest(SimpleTestCase):
+    content = b'body { color: red; }\n' * 100
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with open(os.path.join(STATIC_SOURCE, 'app.css'), 'wb') as file_obj:
+            file_obj.write(cls.content)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(STATIC_ROOT, ignore_errors=True)
+        shutil.rmtree(STATIC_SOURCE, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.hashed_name = staticfiles_storage.stored_name('app.css')
+
+    def test_hashed_file_is_compressed_and_immutable(self):
+        """Файл с хешем отдается сжатым и кэшируется надолго"""
+        self.assertNotEqual(self.hashed_name, 'app.css')
+        response = serve_static(
+            self.factory.get('/', HTTP_ACCEPT_ENCODING='gzip, deflate'),
+            self.hashed_name
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)),
+            self.content
+        )
+
+    def test_unhashed_file_is_revalidated(self):
+        """Файл без хеша отдается как есть и перепроверяется"""
+        response = serve_static(self.factory.get('/'), 'app.css')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertEqual(b''.join(response.streaming_content), self.content)
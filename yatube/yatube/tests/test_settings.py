@@ -0,0 +1,62 @@
+import os
+import runpy
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection, reset_queries
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+
+User = get_user_model()
+SETTINGS_FILE = os.path.join(os.path.dirname(__file__), '..', 'settings.py')
+
+
+def load_settings(profile):
+    with mock.patch.dict(os.environ, {'DJANGO_PROFILE': profile}):
+        return runpy.run_path(SETTINGS_FILE)
+
+
+class SettingsProfileTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.dev = load_settings('dev')
+        cls.prod = load_settings('prod')
+
+    def test_prod_profile_is_lean(self):
+        """Профиль prod не содержит отладочных приложений и middleware"""
+        prod = SettingsProfileTest.prod
+        self.assertFalse(prod['DEBUG'])
+        self.assertNotIn('debug_toolbar', prod['INSTALLED_APPS'])
+        self.assertEqual(
+            prod['MIDDLEWARE'][0], 'yatube.serving.TextGZipMiddleware'
+        )
+        self.assertFalse([
+            middleware for middleware in prod['MIDDLEWARE']
+            if middleware.startswith('debug_toolbar')
+        ])
+        loaders = prod['TEMPLATES'][0]['OPTIONS']['loaders']
+        self.assertEqual(
+            loaders[0][0], 'django.template.loaders.cached.Loader'
+        )
+        self.assertGreater(prod['DATABASES']['default']['CONN_MAX_AGE'], 0)
+        self.assertIn('cache', prod['SESSION_ENGINE'])
+
+    def test_dev_profile_keeps_debug_toolbar(self):
+        """Профиль dev включает отладку и debug toolbar"""
+        dev = SettingsProfileTest.dev
+        self.assertTrue(dev['DEBUG'])
+        self.assertIn('debug_toolbar', dev['INSTALLED_APPS'])
+
+    def test_prod_profile_does_not_log_queries(self):
+        """Без DEBUG запросы к базе не накапливаются в памяти"""
+        user = User.objects.create(username='user')
+        Post.objects.create(text='Текст', author=user)
+        with override_settings(DEBUG=SettingsProfileTest.prod['DEBUG']):
+            reset_queries()
+            response = Client().get(reverse('posts:index'))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(connection.queries_log), 0)
@@ -19,7 +19,8 @@ from django.contrib import admin
 from django.urls import path, re_path
 from django.urls.conf import include
 from django.conf.urls import handler404, handler500
-from django.views.static import serve
+
+from .serving import serve_media, serve_static
 
 
 handler404 = "posts.views.page_not_found"
@@ -28,6 +29,7 @@ handler500 = "posts.views.server_error"
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/v1/', include('posts.api_urls', namespace='api')),
     path('', include('posts.urls', namespace='posts')),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
@@ -44,11 +46,5 @@ if settings.DEBUG:
     urlpatterns += static(
         settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 else:
-    urlpatterns += [re_path(
-        r'^media/(?P<path>.*)$', serve,
-        {'document_root': settings.MEDIA_ROOT, }),
-    ]
-    urlpatterns += [re_path(
-        r'^static/(?P<path>.*)$', serve,
-        {'document_root': settings.STATIC_ROOT}),
-    ]
+    urlpatterns += [re_path(r'^media/(?P<path>.*)$', serve_media)]
+    urlpatterns += [re_path(r'^static/(?P<path>.*)$', serve_static)]